@@ -2,8 +2,9 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
+from .database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 login_manager = LoginManager()
 login_manager.login_view = "auth_login"
 
@@ -21,10 +22,33 @@ def create_app():
     db.init_app(app)
     login_manager.init_app(app)
 
+    from . import database
+    database.init_app(app, db)
+
+    from . import assets
+    assets.init_app(app)
+
+    from .cache import summary_cache
+    summary_cache.init_app(app)
+
+    from .catalog import product_catalog
+    product_catalog.init_app(app)
+
+    from . import pdf
+    pdf.init_app(app)
+
+    from .api import api
+    app.register_blueprint(api)
+
+    from . import metrics
+    metrics.init_app(app)
+
     with app.app_context():
         # import modules
-        from . import routes, models
-        db.create_all()
+        from . import routes, models, commands, migrations
+        # schema changes normally run once per deploy (flask db-upgrade), not in every worker
+        if app.config.get("AUTO_MIGRATE"):
+            migrations.upgrade()
 
     return app
 
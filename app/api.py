@@ -0,0 +1,429 @@
+"""Versioned JSON API for follow-ups, quotations, invoices and products.
+
+    GET    /api/v1/<resource>           keyset-paginated list (?fields=, ?cursor=, ?per_page=, list filters)
+    GET    /api/v1/<resource>/<id>      one record (?fields=), archived follow-ups and invoices included
+    POST   /api/v1/<resource>           create one object, or a JSON array of them
+    PATCH  /api/v1/<resource>           update a JSON array of objects, each with its "id"
+    PATCH  /api/v1/<resource>/<id>      update one record
+    POST   /api/v1/session              log in with {"username", "password"}
+
+A batch is validated as a whole and written in a single transaction: either
+every item is saved or none is, and the errors come back keyed by position.
+GET responses carry an ETag and answer If-None-Match with 304, so a sync
+client that already has the data downloads nothing.
+"""
+from datetime import datetime
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request, abort, url_for
+from flask_login import current_user, login_user, logout_user
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+from werkzeug.exceptions import HTTPException
+
+from . import db, filters, clients
+from .archive import ARCHIVES
+from .models import User, FollowUp, Quotation, Invoice, InvoiceItem, Product
+from .pagination import keyset_paginate
+from .database import replica_reads
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+class Invalid(ValueError):
+    pass
+
+
+# ---------------- Field parsers ----------------
+
+def _string(max_length=None, required=False):
+    def parse(value):
+        if value is None:
+            value = ""
+        if not isinstance(value, str):
+            raise Invalid("must be a string")
+        value = value.strip()
+        if required and not value:
+            raise Invalid("is required")
+        if max_length and len(value) > max_length:
+            raise Invalid(f"must be at most {max_length} characters")
+        return value
+    return parse
+
+
+def _number(minimum=0):
+    def parse(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise Invalid("must be a number")
+        if value < minimum:
+            raise Invalid(f"must be at least {minimum}")
+        return value
+    return parse
+
+
+def _datetime(value):
+    try:
+        value = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise Invalid("must be an ISO 8601 date-time")
+    # stored naive, in the server's local time like the pages' form input
+    if value.tzinfo is not None:
+        raise Invalid("must not include a UTC offset")
+    return value
+
+
+def _choice(*options):
+    def parse(value):
+        if value not in options:
+            raise Invalid("must be one of " + ", ".join(options))
+        return value
+    return parse
+
+
+def _invoice_items(value):
+    if not isinstance(value, list) or not value:
+        raise Invalid("must be a non-empty list")
+    items = []
+    for n, item in enumerate(value):
+        if not isinstance(item, dict):
+            raise Invalid(f"item {n} must be an object")
+        try:
+            qty = item.get("qty", 1)
+            if isinstance(qty, bool) or not isinstance(qty, int) or qty < 1:
+                raise Invalid("qty must be a positive integer")
+            items.append({"name": _string(150, required=True)(item.get("name")),
+                          "qty": qty,
+                          "price": _number()(item.get("price", 0))})
+        except Invalid as e:
+            raise Invalid(f"item {n}: {e}")
+    return items
+
+
+# ---------------- Resources ----------------
+
+class Resource:
+    def __init__(self, model, fields, writable, roles, sort, query, descending=True):
+        self.model = model
+        self.fields = fields        # readable field names, in output order
+        self.writable = writable    # name -> (parser, required on create)
+        self.roles = roles          # roles allowed besides Admin; None for any user
+        self.sort = sort            # keyset sort column
+        self.query = query          # request args -> filtered query (app/filters.py)
+        self.descending = descending
+
+    def columns(self, fields):
+        names = {attr.key for attr in inspect(self.model).column_attrs}
+        return [getattr(self.model, f) for f in fields if f in names]
+
+
+RESOURCES = {
+    "followups": Resource(
+        FollowUp,
+        ["id", "client_name", "client_phone", "followup_datetime", "note", "status", "user_id", "client_id"],
+        {
+            "client_name": (_string(100, required=True), True),
+            "client_phone": (_string(15, required=True), True),
+            "followup_datetime": (_datetime, True),
+            "note": (_string(), False),
+            "status": (_choice("pending", "completed"), False),
+        },
+        ("Sales", "Manager"), FollowUp.followup_datetime, filters.followups,
+    ),
+    "quotations": Resource(
+        Quotation,
+        ["id", "client_name", "client_phone", "product_name", "product_details", "website_price",
+         "created_at", "client_id", "product_id"],
+        {
+            "client_name": (_string(150, required=True), True),
+            "client_phone": (_string(20, required=True), True),
+            "product_name": (_string(150, required=True), True),
+            "product_details": (_string(), False),
+            "website_price": (_number(), False),
+        },
+        None, Quotation.created_at, filters.quotations,
+    ),
+    "invoices": Resource(
+        Invoice,
+        ["id", "client_name", "created_at", "tax_percent", "subtotal", "total", "client_id", "items"],
+        {
+            "client_name": (_string(150, required=True), True),
+            "tax_percent": (_number(), False),
+            "items": (_invoice_items, True),
+        },
+        ("Accountant", "Manager"), Invoice.created_at, filters.invoices,
+    ),
+    "products": Resource(
+        Product,
+        ["id", "name", "details", "website_price"],
+        {
+            "name": (_string(150, required=True), True),
+            "details": (_string(), False),
+            "website_price": (_number(), False),
+        },
+        None, Product.name, filters.products, descending=False,
+    ),
+}
+
+
+def _resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        abort(404)
+    if resource.roles and current_user.role not in resource.roles and current_user.role != "Admin":
+        abort(403)
+    return resource
+
+
+def api_login_required(fn):
+    """Like login_required, but answers 401 instead of redirecting to the login page."""
+    @wraps(fn)
+    def decorated_view(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401)
+        return fn(*args, **kwargs)
+    return decorated_view
+
+
+@api.errorhandler(HTTPException)
+def _http_error(e):
+    response = jsonify(error=e.name, message=e.description)
+    response.status_code = e.code
+    return response
+
+
+# ---------------- Serialization ----------------
+
+def _requested_fields(resource):
+    raw = request.args.get("fields")
+    if not raw:
+        return resource.fields
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in resource.fields]
+    if unknown:
+        abort(400, "Unknown fields: " + ", ".join(unknown))
+    return fields
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def serialize(obj, fields):
+    data = {}
+    for field in fields:
+        if field == "items":
+            data["items"] = [{"name": i.name, "qty": i.qty, "price": i.price, "line_total": i.line_total}
+                             for i in obj.items]
+        else:
+            data[field] = _value(getattr(obj, field))
+    return data
+
+
+def _load_options(resource, fields):
+    # only read the requested columns (plus the keyset columns)
+    columns = resource.columns(set(fields) | {"id", resource.sort.key})
+    options = [load_only(*columns)]
+    if "items" in fields:
+        options.append(selectinload(Invoice.items))
+    return options
+
+
+def _conditional(payload, status=200):
+    response = jsonify(payload)
+    response.status_code = status
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+# ---------------- Writes ----------------
+
+def _parse(resource, data, creating):
+    """Return (values, errors) for one incoming object."""
+    if not isinstance(data, dict):
+        return None, {"_": "must be an object"}
+    values, errors = {}, {}
+    for name, (parse, required) in resource.writable.items():
+        if name not in data:
+            if creating and required:
+                errors[name] = "is required"
+            continue
+        try:
+            values[name] = parse(data[name])
+        except Invalid as e:
+            errors[name] = str(e)
+    unknown = set(data) - set(resource.writable) - {"id"}
+    for name in unknown:
+        errors[name] = "is not writable"
+    return values, errors
+
+
+def _apply(resource, obj, values):
+    items = values.pop("items", None)
+    client_changed = any(k in values and values[k] != getattr(obj, k, None)
+                         for k in ("client_name", "client_phone"))
+    for name, value in values.items():
+        setattr(obj, name, value)
+    if client_changed:
+        obj.client_id = clients.resolve(obj.client_name, getattr(obj, "client_phone", None))
+    if isinstance(obj, Invoice):
+        if items is not None:
+            obj.items = [InvoiceItem(**i) for i in items]
+        obj.recalculate()
+
+
+def _batch_limit(payload):
+    limit = current_app.config.get("API_MAX_BATCH", 500)
+    if len(payload) > limit:
+        abort(413, f"At most {limit} objects per batch")
+
+
+def _json_body():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        abort(400, "Expected a JSON body")
+    return payload
+
+
+def _error_response(errors):
+    response = jsonify(error="Unprocessable Entity", errors=errors)
+    response.status_code = 422
+    return response
+
+
+# ---------------- Endpoints ----------------
+
+@api.route("/session", methods=["POST"])
+def login():
+    data = _json_body()
+    user = User.query.filter_by(username=data.get("username")).first()
+    if user is None or not user.check_password(data.get("password") or ""):
+        abort(401, "Invalid credentials")
+    login_user(user)
+    return jsonify(id=user.id, username=user.username, role=user.role)
+
+
+@api.route("/session", methods=["DELETE"])
+def logout():
+    logout_user()
+    return "", 204
+
+
+@api.route("/<name>")
+@api_login_required
+@replica_reads
+def list_records(name):
+    resource = _resource(name)
+    fields = _requested_fields(resource)
+    query = resource.query(request.args).options(*_load_options(resource, fields))
+    page = keyset_paginate(query, resource.sort, resource.model.id, descending=resource.descending)
+    return _conditional({
+        "items": [serialize(obj, fields) for obj in page.items],
+        "next_cursor": page.next_cursor,
+        "next": page.next_url,
+    })
+
+
+@api.route("/<name>/<int:id>")
+@api_login_required
+@replica_reads
+def get_record(name, id):
+    resource = _resource(name)
+    fields = _requested_fields(resource)
+    obj = db.session.get(resource.model, id, options=_load_options(resource, fields))
+    if obj is None and resource.model in ARCHIVES:
+        # moved out by app/archive.py: still readable here, though no longer writable
+        obj = db.session.get(ARCHIVES[resource.model], id)
+    if obj is None:
+        abort(404)
+    return _conditional(serialize(obj, fields))
+
+
+@api.route("/<name>", methods=["POST"])
+@api_login_required
+def create_records(name):
+    resource = _resource(name)
+    payload = _json_body()
+    batch = isinstance(payload, list)
+    objects = payload if batch else [payload]
+    _batch_limit(objects)
+
+    parsed, errors = [], []
+    for n, data in enumerate(objects):
+        values, item_errors = _parse(resource, data, creating=True)
+        if item_errors:
+            errors.append({"index": n, "errors": item_errors})
+        parsed.append(values)
+    if errors:
+        return _error_response(errors)
+
+    created = []
+    for values in parsed:
+        obj = resource.model()
+        if resource.model is FollowUp:
+            obj.status = "pending"
+            obj.user_id = current_user.id
+        if resource.model is Invoice:
+            obj.tax_percent = 0
+        _apply(resource, obj, values)
+        db.session.add(obj)
+        created.append(obj)
+    db.session.commit()
+
+    if batch:
+        response = jsonify(items=[serialize(obj, resource.fields) for obj in created])
+    else:
+        response = jsonify(serialize(created[0], resource.fields))
+        response.headers["Location"] = url_for("api.get_record", name=name, id=created[0].id)
+    response.status_code = 201
+    return response
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+@api.route("/<name>", methods=["PATCH"])
+@api.route("/<name>/<int:id>", methods=["PATCH"])
+@api_login_required
+def update_records(name, id=None):
+    resource = _resource(name)
+    payload = _json_body()
+    batch = id is None
+    if batch and not isinstance(payload, list):
+        abort(400, "Expected a JSON array of objects with an id")
+    objects = payload if batch else [dict(payload, id=id) if isinstance(payload, dict) else payload]
+    _batch_limit(objects)
+
+    ids = [data.get("id") for data in objects if isinstance(data, dict)]
+    query = resource.model.query.filter(resource.model.id.in_([i for i in ids if _is_id(i)]))
+    if resource.model is Invoice:
+        query = query.options(selectinload(Invoice.items))
+    found = {obj.id: obj for obj in query}
+
+    parsed, errors = [], []
+    for n, data in enumerate(objects):
+        values, item_errors = _parse(resource, data, creating=False)
+        if isinstance(data, dict) and not _is_id(data.get("id")):
+            item_errors["id"] = "must be an integer"
+        elif isinstance(data, dict) and data.get("id") not in found:
+            item_errors["id"] = "not found"
+        if item_errors:
+            errors.append({"index": n, "errors": item_errors})
+        parsed.append(values)
+    if errors:
+        if not batch and "id" in errors[0]["errors"]:
+            abort(404)
+        return _error_response(errors)
+
+    updated = []
+    for data, values in zip(objects, parsed):
+        obj = found[data["id"]]
+        _apply(resource, obj, values)
+        updated.append(obj)
+    db.session.commit()
+
+    if batch:
+        return jsonify(items=[serialize(obj, resource.fields) for obj in updated])
+    return jsonify(serialize(updated[0], resource.fields))
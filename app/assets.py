@@ -0,0 +1,173 @@
+"""Static asset fingerprinting and HTTP compression.
+
+At startup every file under static/ (except generated invoice PDFs) is
+hashed, and url_for("static", ...) appends ?v=<content hash>. A request
+carrying the current hash can be cached by browsers and proxies for a year
+("immutable"), since any change to the file changes its URL. Text assets
+above COMPRESS_MIN_SIZE are also compressed once per deploy by `flask
+assets-build`, into STATIC_CACHE_DIR (gzip, plus brotli when the brotli
+package is installed), and served in place of the original to clients that
+accept the encoding. App startup only reads that directory: without the
+copies, static files are served uncompressed.
+
+HTML, JSON, CSS and CSV responses above COMPRESS_MIN_SIZE are compressed on
+the fly. Streamed responses (exports) and files are left alone.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {"text/html", "text/css", "text/csv", "text/plain", "text/javascript",
+                "application/javascript", "application/json", "image/svg+xml"}
+SKIP_DIRS = {"invoices"}  # rendered PDFs, written at runtime
+
+
+def _compress(data, encoding, best=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+def _encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def _negotiate(available):
+    return request.accept_encodings.best_match(available) if available else None
+
+
+class StaticAssets:
+    def __init__(self, root, cache_dir, min_size=500):
+        self.root = root
+        self.cache_dir = cache_dir
+        self.min_size = min_size
+        self.hashes = {}    # filename (as passed to url_for) -> content hash
+        self.variants = {}  # filename -> {encoding: path of the precompressed copy}
+
+    def _scan(self):
+        """Yield (filename, data, digest, compressible) for every static file."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root:
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                filename = os.path.relpath(path, self.root).replace(os.sep, "/")
+                with open(path, "rb") as fh:
+                    data = fh.read()
+                compressible = mimetypes.guess_type(name)[0] in COMPRESSIBLE and len(data) >= self.min_size
+                yield filename, data, hashlib.sha256(data).hexdigest()[:12], compressible
+
+    def _cache_path(self, filename, digest, encoding):
+        # named by content hash, so a stale copy is never served and workers can share the directory
+        name = os.path.basename(filename)
+        return os.path.join(self.cache_dir, f"{digest}-{name}.{'br' if encoding == 'br' else 'gz'}")
+
+    def build(self):
+        """Hash every static file and pick up the precompressed copies that exist.
+
+        Returns the compressible files that have no copies yet.
+        """
+        missing = []
+        for filename, data, digest, compressible in self._scan():
+            self.hashes[filename] = digest
+            if not compressible:
+                continue
+            paths = {encoding: self._cache_path(filename, digest, encoding) for encoding in _encodings()}
+            found = {encoding: path for encoding, path in paths.items() if os.path.exists(path)}
+            if found:
+                self.variants[filename] = found
+            if len(found) < len(paths):
+                missing.append(filename)
+        return missing
+
+    def precompress(self):
+        """Write the missing precompressed copies (`flask assets-build`); returns how many were written."""
+        written = 0
+        for filename, data, digest, compressible in self._scan():
+            if not compressible:
+                continue
+            for encoding in _encodings():
+                path = self._cache_path(filename, digest, encoding)
+                if os.path.exists(path):
+                    continue
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as fh:
+                    fh.write(_compress(data, encoding, best=True))
+                os.replace(tmp, path)
+                written += 1
+        self.build()
+        return written
+
+
+def init_app(app):
+    config = app.config
+    min_size = config.get("COMPRESS_MIN_SIZE", 500)
+    assets = StaticAssets(app.static_folder,
+                          config.get("STATIC_CACHE_DIR") or os.path.join(app.instance_path, "static-cache"),
+                          min_size)
+    missing = assets.build()
+    if missing:
+        app.logger.info("%d static files have no precompressed copies; run `flask assets-build`", len(missing))
+    app.extensions["static_assets"] = assets
+    max_age = config.get("STATIC_MAX_AGE", 31536000)
+
+    @app.url_defaults
+    def fingerprint(endpoint, values):
+        if endpoint == "static" and "v" not in values:
+            digest = assets.hashes.get(values.get("filename"))
+            if digest:
+                values["v"] = digest
+
+    def static(filename):
+        variants = assets.variants.get(filename, {})
+        encoding = _negotiate(list(variants))
+        if encoding:
+            response = send_file(variants[encoding], mimetype=mimetypes.guess_type(filename)[0])
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = app.send_static_file(filename)
+        if variants:
+            response.vary.add("Accept-Encoding")
+        if request.args.get("v") and request.args["v"] == assets.hashes.get(filename):
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
+
+    app.view_functions["static"] = static
+
+    if not config.get("COMPRESS_RESPONSES", True):
+        return
+
+    # registered before the other after_request hooks, so it runs last
+    @app.after_request
+    def compress(response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough or response.is_streamed
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE):
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = _negotiate(_encodings())
+        if not encoding:
+            return response
+        response.set_data(_compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        # the encoded body is a different representation: its ETag can only be weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
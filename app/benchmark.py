@@ -0,0 +1,275 @@
+"""Route benchmark harness (`flask benchmark`).
+
+Drives every main page, export and API route through the Flask test client
+as a logged-in Admin and reports latency percentiles, SQL statements per
+request and peak Python memory per route. Results are written as JSON so
+two runs (e.g. before and after a commit, on the same `flask seed-data`
+dataset) can be compared with --compare.
+
+The test client skips the network and the WSGI server, so the numbers are
+the application's own cost: handy for regressions, not a capacity figure.
+
+With --startup, fresh Python processes also time importing the app package,
+create_app() and the first request to a few routes (which pays for every
+lazy import and warm-up), as a worker does after a deploy or restart.
+"""
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import event, func
+
+from . import db
+from .models import User, Client, FollowUp, Product, Quotation, Invoice, InvoiceItem
+
+COUNTED_MODELS = [User, Client, FollowUp, Product, Quotation, Invoice, InvoiceItem]
+MIN_REGRESSION_MS = 1.0
+
+
+def routes(include_exports=False):
+    """label -> URL of the routes to measure, using ids that exist in the current database."""
+    invoice_id = db.session.query(func.max(Invoice.id)).scalar()
+    client_id = db.session.query(func.max(Client.id)).scalar()
+    year = datetime.now().year
+    urls = {
+        "dashboard": "/",
+        "reports": f"/reports?year={year}",
+        "followups": "/followups",
+        "followups?status": "/followups?status=pending",
+        "quotations": "/quotations",
+        "invoices": "/invoices",
+        "products": "/products",
+        "search": "/search?q=sharma",
+        "search phone": "/search?q=70000",
+        "api followups": "/api/v1/followups?per_page=100",
+        "api invoices+items": "/api/v1/invoices?per_page=100&fields=id,total,items",
+    }
+    if invoice_id:
+        urls["invoice view"] = f"/invoices/view/{invoice_id}"
+        urls["invoice pdf"] = f"/invoices/pdf/{invoice_id}"
+    if client_id:
+        urls["client timeline"] = f"/clients/{client_id}"
+    if include_exports:
+        urls["export followups csv"] = "/followups/export.csv"
+        urls["export invoices json"] = "/invoices/export.json"
+        urls["export report csv"] = f"/reports/export.csv?year={year}"
+    return urls
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "after_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "after_cursor_execute", self._count)
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _request(client, url):
+    response = client.get(url)
+    # consume streamed bodies so exports are measured end to end
+    size = sum(len(chunk) for chunk in response.response) if response.is_streamed else len(response.data)
+    response.close()
+    return response.status_code, size
+
+
+def run(app, requests=20, warmup=2, username=None, include_exports=False, echo=None):
+    """Benchmark each route and return the results as a JSON-serializable dict."""
+    echo = echo or (lambda msg: None)
+    with app.app_context():
+        query = User.query.filter_by(username=username) if username else User.query.filter_by(role="Admin")
+        user = query.order_by(User.id).first()
+        if user is None:
+            raise LookupError("No user to log in as: pass --user or create an Admin")
+        urls = routes(include_exports)
+        counts = {m.__tablename__: m.query.count() for m in COUNTED_MODELS}
+        engine = db.engine
+        dialect = engine.dialect.name
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user.id)
+        session["_fresh"] = True
+
+    results = {}
+    for label, url in urls.items():
+        for _ in range(warmup):
+            _request(client, url)
+
+        timings = []
+        with QueryCounter(engine) as counter:
+            for _ in range(requests):
+                started = time.perf_counter()
+                status, size = _request(client, url)
+                timings.append((time.perf_counter() - started) * 1000)
+
+        # one more request under tracemalloc, which would skew the timings
+        tracemalloc.start()
+        _request(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings.sort()
+        results[label] = {
+            "url": url,
+            "status": status,
+            "bytes": size,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "mean_ms": round(sum(timings) / len(timings), 2),
+            "queries": round(counter.count / requests, 1),
+            "peak_kb": round(peak / 1024, 1),
+        }
+        r = results[label]
+        echo(f"{label:24} {status}  p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+             f"p99 {r['p99_ms']:8.2f} ms  {r['queries']:5} queries  {r['peak_kb']:9.1f} KiB")
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": dialect,
+            "rows": counts,
+            "requests": requests,
+        },
+        "routes": results,
+    }
+
+
+# run in a fresh interpreter by startup(); argv[1] is {"user_id": ..., "urls": {label: url}}
+_STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app as package
+imported = time.perf_counter()
+application = package.create_app()
+created = time.perf_counter()
+args = json.loads(sys.argv[1])
+client = application.test_client()
+with client.session_transaction() as session:
+    session["_user_id"] = str(args["user_id"])
+    session["_fresh"] = True
+first = {}
+for label, url in args["urls"].items():
+    t = time.perf_counter()
+    client.get(url).close()
+    first[label] = (time.perf_counter() - t) * 1000
+print(json.dumps({"import_ms": (imported - started) * 1000, "create_app_ms": (created - imported) * 1000,
+                  "first_request_ms": first}))
+"""
+
+
+def startup(app, runs=5, username=None, echo=None):
+    """Median cold import, create_app() and first-request times over fresh processes."""
+    echo = echo or (lambda msg: None)
+    with app.app_context():
+        query = User.query.filter_by(username=username) if username else User.query.filter_by(role="Admin")
+        user = query.order_by(User.id).first()
+        if user is None:
+            raise LookupError("No user to log in as: pass --user or create an Admin")
+        urls = routes()
+        urls = {label: urls[label] for label in ("dashboard", "followups", "invoice pdf") if label in urls}
+        args = json.dumps({"user_id": user.id, "urls": urls})
+
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT, args], capture_output=True, text=True,
+                             cwd=os.path.dirname(app.root_path), env=os.environ.copy(), check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    result = {
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "create_app_ms": round(statistics.median(s["create_app_ms"] for s in samples), 1),
+        "first_request_ms": {label: round(statistics.median(s["first_request_ms"][label] for s in samples), 1)
+                             for label in urls},
+        "runs": runs,
+    }
+    echo(f"{'import':24} {result['import_ms']:8.1f} ms")
+    echo(f"{'create_app':24} {result['create_app_ms']:8.1f} ms")
+    for label, ms in result["first_request_ms"].items():
+        echo(f"{'first ' + label:24} {ms:8.1f} ms")
+    return result
+
+
+def _startup_timings(results):
+    startup = results.get("startup") or {}
+    timings = {"import": startup.get("import_ms"), "create_app": startup.get("create_app_ms")}
+    timings.update({f"first {label}": ms for label, ms in startup.get("first_request_ms", {}).items()})
+    return {label: ms for label, ms in timings.items() if ms is not None}
+
+
+def compare(baseline, current, threshold=20.0):
+    """Return (one report line per route, labels of the routes that regressed).
+
+    A route regresses when its median grows by more than threshold percent (and
+    by at least MIN_REGRESSION_MS, so sub-millisecond noise is ignored) or when
+    it issues more SQL statements than before.
+    """
+    regressions = []
+    lines = []
+    for label, now in current["routes"].items():
+        before = baseline["routes"].get(label)
+        if before is None:
+            lines.append(f"{label:24} new")
+            continue
+        delta = now["p50_ms"] - before["p50_ms"]
+        change = delta / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+        regressed = (change > threshold and delta >= MIN_REGRESSION_MS) or now["queries"] > before["queries"]
+        if regressed:
+            regressions.append(label)
+        lines.append(f"{label:24} p50 {before['p50_ms']:8.2f} -> {now['p50_ms']:8.2f} ms ({change:+6.1f}%)  "
+                     f"queries {before['queries']} -> {now['queries']}{'  REGRESSION' if regressed else ''}")
+    before_startup = _startup_timings(baseline)
+    for label, now in _startup_timings(current).items():
+        before = before_startup.get(label)
+        if before is None:
+            continue
+        delta = now - before
+        change = delta / before * 100 if before else 0.0
+        regressed = change > threshold and delta >= MIN_REGRESSION_MS
+        if regressed:
+            regressions.append(label)
+        lines.append(f"{label:24} {before:8.1f} -> {now:8.1f} ms ({change:+6.1f}%){'  REGRESSION' if regressed else ''}")
+    return lines, regressions
+
+
+def save(results, path):
+    with open(path, "w") as fh:
+        json.dump(results, fh, indent=2)
+
+
+def load(path):
+    with open(path) as fh:
+        return json.load(fh)
@@ -0,0 +1,191 @@
+"""Summary cache for dashboard/report aggregates.
+
+Values are stored through a small backend interface so the in-process LRU can
+be swapped for a shared store. Invalidation is per namespace: each namespace
+has a generation token that is part of every key, and committing a write to
+one of the watched models replaces the tokens that depend on it. Tokens are
+unique, so an evicted token only costs a miss and never serves stale data.
+
+The same commit hooks also evict users from user_cache, which backs the
+Flask-Login user loader.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class CacheBackend:
+    """Interface for summary cache storage."""
+
+    def get(self, key):
+        """Return the cached value or None."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class NullCache(CacheBackend):
+    """Backend that stores nothing; used when caching is disabled."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+# which summary namespaces each model's writes invalidate
+DEPENDENCIES = {
+    "Client": ("dashboard",),
+    "FollowUp": ("dashboard", "reports"),
+    "Quotation": ("dashboard",),
+    "Invoice": ("dashboard", "reports"),
+    "InvoiceItem": ("dashboard", "reports"),
+    "SalesRollup": ("dashboard", "reports"),
+    "FollowUpRollup": ("dashboard", "reports"),
+}
+
+
+class SummaryCache:
+    def __init__(self, backend=None):
+        self.backend = backend or NullCache()
+
+    def init_app(self, app):
+        backend = app.config.get("SUMMARY_CACHE_BACKEND")
+        if backend is None:
+            size = app.config.get("SUMMARY_CACHE_SIZE", 256)
+            ttl = app.config.get("SUMMARY_CACHE_TTL", 60)
+            backend = LRUCache(size, ttl) if ttl else NullCache()
+        self.backend = backend
+        app.extensions["summary_cache"] = self
+
+    def _generation(self, namespace):
+        gen = self.backend.get(("gen", namespace))
+        if gen is None:
+            gen = self._new_generation(namespace)
+        return gen
+
+    def _new_generation(self, namespace):
+        gen = uuid.uuid4().hex
+        # generation keys must outlive the entries they guard, so no TTL
+        self.backend.set(("gen", namespace), gen, ttl=0)
+        return gen
+
+    def get_or_compute(self, namespace, key, compute):
+        """Return the cached summary for (namespace, key), computing it on a miss."""
+        full_key = (namespace, self._generation(namespace), key)
+        value = self.backend.get(full_key)
+        if value is None:
+            value = compute()
+            self.backend.set(full_key, value)
+        return value
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self._new_generation(namespace)
+
+    def clear(self):
+        self.backend.clear()
+
+
+summary_cache = SummaryCache()
+
+# user id -> {"id", "username", "role"} for the login user loader
+user_cache = LRUCache(maxsize=1024, ttl=30)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_namespaces(session, flush_context):
+    namespaces = session.info.setdefault("summary_namespaces", set())
+    user_ids = session.info.setdefault("user_ids", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        name = type(obj).__name__
+        namespaces.update(DEPENDENCIES.get(name, ()))
+        if name == "User":
+            user_ids.add(obj.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_writes(orm_execute_state):
+    # bulk insert()/update()/delete() statements never reach after_flush
+    state = orm_execute_state
+    if not (state.is_insert or state.is_update or state.is_delete) or state.bind_mapper is None:
+        return
+    name = state.bind_mapper.class_.__name__
+    state.session.info.setdefault("summary_namespaces", set()).update(DEPENDENCIES.get(name, ()))
+    if name == "User":
+        state.session.info["clear_users"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    namespaces = session.info.pop("summary_namespaces", None)
+    if namespaces:
+        summary_cache.invalidate(*namespaces)
+    for user_id in session.info.pop("user_ids", ()):
+        user_cache.delete(user_id)
+    if session.info.pop("clear_users", False):
+        user_cache.clear()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("summary_namespaces", None)
+    session.info.pop("user_ids", None)
+    session.info.pop("clear_users", None)
@@ -0,0 +1,113 @@
+"""In-process product catalog for the quotation form and its typeahead.
+
+The whole catalog (id, name, details, price) is loaded with one query into a
+list sorted by case-folded name, so prefix lookups are a binary search and
+product_id lookups a dict hit. Committing a write to Product in this process
+bumps the catalog version and drops the snapshot; other processes pick the
+change up within CATALOG_CACHE_TTL seconds, as with the summary cache. An id
+missing from the snapshot is looked up in the database, so a product just
+added by another process is found at once (and the snapshot reloaded).
+"""
+import bisect
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Product
+
+
+class Snapshot:
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = sorted(rows, key=lambda r: (r["name"].casefold(), r["id"]))
+        self.keys = [r["name"].casefold() for r in self.rows]
+        self.by_id = {r["id"]: r for r in self.rows}
+
+
+class ProductCatalog:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.version = 0
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get("CATALOG_CACHE_TTL", 300)
+        app.extensions["product_catalog"] = self
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._snapshot = None
+
+    def snapshot(self):
+        snap = self._snapshot
+        if snap is not None and (not self.ttl or time.monotonic() - self._loaded_at < self.ttl):
+            return snap
+        version = self.version
+        rows = [{"id": id, "name": name, "details": details, "website_price": price}
+                for id, name, details, price in db.session.query(
+                    Product.id, Product.name, Product.details, Product.website_price)]
+        snap = Snapshot(version, rows)
+        with self._lock:
+            # a write committed while loading makes this snapshot stale: serve it, don't keep it
+            if self.version == version:
+                self._snapshot = snap
+                self._loaded_at = time.monotonic()
+        return snap
+
+    def get(self, product_id):
+        row = self.snapshot().by_id.get(product_id)
+        if row is None:
+            product = db.session.get(Product, product_id)
+            if product is None:
+                return None
+            # created in another process since the snapshot was taken
+            self.invalidate()
+            row = {"id": product.id, "name": product.name, "details": product.details,
+                   "website_price": product.website_price}
+        return row
+
+    def search(self, prefix, limit=10):
+        """Products whose name starts with prefix (case-insensitive), by name."""
+        snap = self.snapshot()
+        prefix = prefix.strip().casefold()
+        start = bisect.bisect_left(snap.keys, prefix)
+        found = []
+        for key, row in zip(snap.keys[start:start + limit], snap.rows[start:start + limit]):
+            if not key.startswith(prefix):
+                break
+            found.append(row)
+        return found
+
+
+product_catalog = ProductCatalog()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_product_writes(session, flush_context):
+    if any(isinstance(obj, Product) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info["catalog_dirty"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_product_writes(orm_execute_state):
+    state = orm_execute_state
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None \
+            and state.bind_mapper.class_ is Product:
+        state.session.info["catalog_dirty"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("catalog_dirty", False):
+        product_catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("catalog_dirty", None)
@@ -0,0 +1,279 @@
+"""Client resolution and per-client history.
+
+Follow-ups, quotations and invoices are entered with free-text client
+details. Each one is linked to a Client row through client_id: a normalized
+phone number identifies a client, and details without a phone (invoices)
+match the oldest client with the same name. Unknown clients are created on
+the fly, so the Client table holds one row per real client.
+"""
+import heapq
+from itertools import islice
+
+from sqlalchemy import and_, bindparam, delete, func, insert, null, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from . import db, search
+from .models import Client, FollowUp, Quotation, Invoice, FollowUpArchive, InvoiceArchive, SearchDocument
+from .pagination import Page, encode_cursor, decode_cursor, page_size
+from .utils import normalize_phone
+
+
+def name_key(name):
+    return " ".join((name or "").split()).lower()
+
+
+def match_key(name, phone=None):
+    """("phone", digits) when there is a usable phone number, else ("name", key)."""
+    phone_key = normalize_phone(phone)
+    if phone_key:
+        return ("phone", phone_key)
+    return ("name", name_key(name))
+
+
+def _lookup(keys):
+    """Map each match key to an existing client id, where one exists."""
+    phones = {value for kind, value in keys if kind == "phone"}
+    names = {value for kind, value in keys if kind == "name"}
+    found = {}
+    if phones:
+        for client_id, phone_key in (db.session.query(Client.id, Client.phone_key)
+                                     .filter(Client.phone_key.in_(phones))):
+            found[("phone", phone_key)] = client_id
+    if names:
+        # newest first, so the oldest client with a name wins
+        for client_id, key in (db.session.query(Client.id, Client.name_key)
+                               .filter(Client.name_key.in_(names))
+                               .order_by(Client.id.desc())):
+            found[("name", key)] = client_id
+    return found
+
+
+def _new_client(name, phone, key):
+    phone = (phone or "").strip() or None
+    return {
+        "name": (name or "").strip(),
+        "phone": phone,
+        "name_key": name_key(name),
+        "phone_key": key[1] if key[0] == "phone" else None,
+    }
+
+
+def resolve(name, phone=None):
+    """Return the id of the client for these details, creating the client if needed."""
+    key = match_key(name, phone)
+    client_id = _lookup([key]).get(key)
+    if client_id is not None:
+        return client_id
+    client = Client(**_new_client(name, phone, key))
+    try:
+        with db.session.begin_nested():
+            db.session.add(client)
+    except IntegrityError:
+        # another request created the same client first
+        return _lookup([key])[key]
+    return client.id
+
+
+def resolve_many(rows):
+    """Resolve a batch of (name, phone) pairs with one lookup and one INSERT.
+
+    Returns (client ids in row order, number of clients created).
+    """
+    keys = [match_key(name, phone) for name, phone in rows]
+    found = _lookup(keys)
+    new = {}
+    for (name, phone), key in zip(rows, keys):
+        if key not in found and key not in new:
+            new[key] = _new_client(name, phone, key)
+    if new:
+        last_id = db.session.query(func.max(Client.id)).scalar()
+        db.session.execute(insert(Client), list(new.values()))
+        # executemany inserts skip the search flush hook
+        search.reindex("clients", after_id=last_id or 0)
+        found.update(_lookup(list(new)))
+    return [found[key] for key in keys], len(new)
+
+
+# ---------------- Backfill ----------------
+
+def normalize_clients(batch_size=500):
+    """Fill the match keys of existing clients, dropping duplicates by phone.
+
+    Clients were not referenced by anything before client_id existed, so a
+    duplicate can simply be deleted in favour of the oldest row. Runs in
+    migration 8, so it only touches the columns that exist at that version.
+    """
+    table = Client.__table__
+    docs = SearchDocument.__table__
+    dropped = 0
+    while True:
+        batch = (db.session.query(Client.id, Client.name, Client.phone)
+                 .filter(Client.name_key.is_(None))
+                 .order_by(Client.id).limit(batch_size).all())
+        if not batch:
+            break
+        keys = {c.id: normalize_phone(c.phone) or None for c in batch}
+        taken = {pk for (pk,) in db.session.query(Client.phone_key)
+                 .filter(Client.phone_key.in_({pk for pk in keys.values() if pk}))}
+        duplicates, updates = [], []
+        for c in batch:
+            phone_key = keys[c.id]
+            if phone_key and phone_key in taken:
+                duplicates.append(c.id)
+                continue
+            updates.append({"b_id": c.id, "name_key": name_key(c.name), "phone_key": phone_key})
+            if phone_key:
+                taken.add(phone_key)
+        if duplicates:
+            db.session.execute(delete(table).where(table.c.id.in_(duplicates)))
+            db.session.execute(delete(docs).where(docs.c.entity == "clients", docs.c.ref_id.in_(duplicates)))
+            dropped += len(duplicates)
+        if updates:
+            db.session.execute(update(table).where(table.c.id == bindparam("b_id")), updates)
+        db.session.commit()
+    return dropped
+
+
+# model -> column holding the client's phone, if the model has one
+LINKED = [
+    (FollowUp, FollowUp.client_phone),
+    (Quotation, Quotation.client_phone),
+    (Invoice, None),
+]
+
+
+def backfill(batch_size=500):
+    """Link follow-ups, quotations and invoices without a client_id to clients.
+
+    Rows are processed in id order, one batch per transaction; only rows with
+    client_id NULL are touched, so an interrupted run can simply be restarted.
+    Returns the number of rows linked.
+    """
+    linked = 0
+    for model, phone_col in LINKED:
+        last_id = 0
+        phone = phone_col if phone_col is not None else null()
+        while True:
+            rows = (db.session.query(model.id, model.client_name, phone)
+                    .filter(model.client_id.is_(None), model.id > last_id)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                    .all())
+            if not rows:
+                break
+            client_ids, _ = resolve_many([(name, ph) for _, name, ph in rows])
+            db.session.execute(update(model), [
+                {"id": row_id, "client_id": client_id}
+                for (row_id, _, _), client_id in zip(rows, client_ids)
+            ])
+            db.session.commit()
+            last_id = rows[-1][0]
+            linked += len(rows)
+    return linked
+
+
+# ---------------- Timeline ----------------
+
+def _followup_event(f):
+    return {"title": f.note or "Follow-up", "detail": f.status, "amount": None}
+
+
+def _quotation_event(q):
+    return {"title": q.product_name, "detail": q.product_details, "amount": q.website_price}
+
+
+def _invoice_event(inv):
+    return {"title": f"Invoice #{inv.id}", "detail": None, "amount": inv.total}
+
+
+# kind -> (model, date column, row -> event fields); kinds sort alphabetically
+# as the tie-breaker between events at the same moment
+TIMELINE = {
+    "followup": (FollowUp, FollowUp.followup_datetime, _followup_event),
+    "invoice": (Invoice, Invoice.created_at, _invoice_event),
+    "quotation": (Quotation, Quotation.created_at, _quotation_event),
+}
+
+# kinds whose older rows may have moved to an archive table (app/archive.py)
+ARCHIVED = {"followup": FollowUpArchive, "invoice": InvoiceArchive}
+
+
+def _sources(kind):
+    """(model, date column) for kind's hot table and, if it has one, its archive."""
+    model, date_col, _ = TIMELINE[kind]
+    yield model, date_col
+    if kind in ARCHIVED:
+        yield ARCHIVED[kind], getattr(ARCHIVED[kind], date_col.key)
+
+
+def _sort_key(event):
+    return event["at"], event["kind"], event["id"]
+
+
+def _encode(event):
+    # base64 never contains ".", so the kind can ride along after it
+    return encode_cursor(event["at"], event["id"]) + "." + event["kind"]
+
+
+def _decode(cursor):
+    token, _, kind = (cursor or "").partition(".")
+    key = decode_cursor(token)
+    if key is None or kind not in TIMELINE:
+        return None
+    return key[0], kind, key[1]
+
+
+def _after(kind, date_col, id_col, key):
+    """Rows of kind that sort after the cursor in (date, kind, id) descending order."""
+    at, last_kind, last_id = key
+    if kind < last_kind:
+        return date_col <= at
+    if kind > last_kind:
+        return date_col < at
+    return or_(date_col < at, and_(date_col == at, id_col < last_id))
+
+
+def timeline_queries(client_id, kinds=None, key=None, per_page=25):
+    """(kind, date column, query) per stream timeline() merges: one page of each kind and archive."""
+    for kind in sorted(kinds or TIMELINE):
+        for model, date_col in _sources(kind):
+            query = model.query.filter(model.client_id == client_id)
+            if key is not None:
+                query = query.filter(_after(kind, date_col, model.id, key))
+            yield kind, date_col, query.order_by(date_col.desc(), model.id.desc()).limit(per_page + 1)
+
+
+def timeline(client_id, kinds=None, cursor=None, per_page=None):
+    """One Page of a client's follow-ups, quotations and invoices, newest first.
+
+    Each kind (and its archive) is read with its own (client_id, date, id)
+    index range scan, limited to one page, and the sorted streams are merged
+    in Python. Archived rows keep their ids, so cursors work across both.
+    """
+    if per_page is None:
+        per_page = page_size()
+    key = _decode(cursor)
+    streams = []
+    for kind, date_col, rows in timeline_queries(client_id, kinds, key, per_page):
+        fields = TIMELINE[kind][2]
+        streams.append([dict(fields(row), kind=kind, id=row.id, at=getattr(row, date_col.key))
+                        for row in rows])
+    events = list(islice(heapq.merge(*streams, key=_sort_key, reverse=True), per_page + 1))
+    next_cursor = None
+    if len(events) > per_page:
+        events = events[:per_page]
+        next_cursor = _encode(events[-1])
+    return Page(events, per_page, next_cursor, cursor if key is not None else None)
+
+
+def summary(client_id, kinds=None):
+    """Per-kind counts for a client, plus the invoiced total when invoices are visible."""
+    kinds = kinds or TIMELINE
+    counts = {kind: sum(model.query.filter(model.client_id == client_id).count() for model, _ in _sources(kind))
+              for kind in kinds}
+    invoiced = None
+    if "invoice" in kinds:
+        invoiced = sum(db.session.query(func.coalesce(func.sum(model.total), 0))
+                       .filter(model.client_id == client_id).scalar()
+                       for model, _ in _sources("invoice"))
+    return counts, invoiced
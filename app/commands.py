@@ -0,0 +1,247 @@
+import time
+from datetime import datetime
+
+import click
+from flask import current_app as app
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from werkzeug.datastructures import MultiDict
+
+from . import (db, migrations, pdf, jobs, importer, search, clients, datagen, benchmark, reminders, rollups, archive,
+               filters, reporting)
+from .models import User
+from .pagination import keyset_query
+
+
+@app.cli.command("db-upgrade")
+def db_upgrade():
+    """Apply pending schema migrations."""
+    applied = migrations.upgrade(echo=click.echo)
+    if not applied:
+        click.echo(f"Database is up to date (version {migrations.current_version()})")
+
+
+@app.cli.command("db-version")
+def db_version():
+    """Show the applied schema version and any pending migrations."""
+    click.echo(f"Current version: {migrations.current_version()}")
+    for version, name, _ in migrations.pending_migrations():
+        click.echo(f"Pending {version}: {name}")
+
+
+@app.cli.command("export-invoice-pdfs")
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), required=True)
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), required=True)
+@click.option("--out", type=click.Path(dir_okay=False), required=True, help="ZIP file to write")
+@click.option("--workers", type=int, default=None, help="Render processes (default: one per CPU)")
+def export_invoice_pdfs(start, end, out, workers):
+    """Render every invoice created between START and END into a ZIP of PDFs."""
+    with open(out, "wb") as fh:
+        for chunk in pdf.export_invoices_zip(start.date(), end.date(), workers=workers):
+            fh.write(chunk)
+    click.echo(f"Wrote {out}")
+
+
+@app.cli.command("jobs-worker")
+@click.option("--concurrency", default=2, show_default=True, help="Jobs run at the same time")
+@click.option("--poll-interval", default=1.0, show_default=True, help="Seconds between polls when idle")
+@click.option("--once", is_flag=True, help="Exit once the queue is empty")
+def jobs_worker(concurrency, poll_interval, once):
+    """Process background jobs from the job table."""
+    jobs.work(app._get_current_object(), concurrency=concurrency, poll_interval=poll_interval, once=once)
+
+
+@app.cli.command("reminders")
+@click.option("--once", is_flag=True, help="Send what is due now and exit")
+def send_reminders(once):
+    """Send follow-up reminders as they fall due (see REMINDER_* settings)."""
+    sent = reminders.run(app._get_current_object(), once=once)
+    if once:
+        click.echo(f"Sent {sent} reminders")
+
+
+@app.cli.command("import-data")
+@click.argument("entity", type=click.Choice(sorted(importer.ENTITIES)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user", "username", help="Owner of imported follow-ups")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--no-resume", is_flag=True, help="Start over even if an earlier run of this file failed")
+def import_data(entity, path, username, batch_size, no_resume):
+    """Bulk import clients, products or follow-ups from a CSV or .xlsx file."""
+    user_id = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f"No such user: {username}")
+        user_id = user.id
+    run = importer.start_run(entity, path, user_id=user_id, resume=not no_resume)
+    if run.rows_done:
+        click.echo(f"Resuming import {run.id} after row {run.rows_done}")
+    importer.import_file(run, path, batch_size=batch_size)
+    click.echo(f"Imported {run.inserted} rows, {run.failed} rejected")
+    if run.failed:
+        click.echo(f"Row errors: {importer.error_path(run)}")
+
+
+@app.cli.command("backfill-clients")
+@click.option("--batch-size", default=500, show_default=True)
+def backfill_clients(batch_size):
+    """Link existing follow-ups, quotations and invoices to clients now, without the worker."""
+    dropped = clients.normalize_clients(batch_size=batch_size)
+    if dropped:
+        click.echo(f"Merged {dropped} duplicate clients")
+    click.echo(f"Linked {clients.backfill(batch_size=batch_size)} rows to clients")
+
+
+@app.cli.command("seed-data")
+@click.option("--clients", default=1000, show_default=True)
+@click.option("--products", default=200, show_default=True)
+@click.option("--followups", default=10000, show_default=True)
+@click.option("--quotations", default=2000, show_default=True)
+@click.option("--invoices", default=2000, show_default=True)
+@click.option("--max-items", default=5, show_default=True, help="Line items per invoice (1 to N)")
+@click.option("--users", default=5, show_default=True, help="Sales users owning the follow-ups")
+@click.option("--years", default=2, show_default=True, help="Spread dates over this many past years")
+@click.option("--seed", default=42, show_default=True, help="Random seed, for repeatable datasets")
+@click.option("--batch-size", default=5000, show_default=True)
+def seed_data(**volumes):
+    """Add a synthetic dataset (e.g. --followups 1000000) for benchmarks and load tests."""
+    started = time.perf_counter()
+    datagen.generate(echo=click.echo, **volumes)
+    click.echo(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+@app.cli.command("benchmark")
+@click.option("--requests", "n", default=20, show_default=True, help="Timed requests per route")
+@click.option("--warmup", default=2, show_default=True)
+@click.option("--user", "username", help="Log in as this user (default: the first Admin)")
+@click.option("--exports", is_flag=True, help="Also time the full CSV/JSON exports")
+@click.option("--out", type=click.Path(dir_okay=False), help="Write the results to this JSON file")
+@click.option("--compare", "baseline", type=click.Path(exists=True, dir_okay=False),
+              help="Earlier results file to compare against")
+@click.option("--threshold", default=20.0, show_default=True, help="Median growth (%) that counts as a regression")
+@click.option("--startup", "startup_runs", default=0, show_default=True,
+              help="Also time import, create_app and first requests over this many fresh processes")
+def run_benchmark(n, warmup, username, exports, out, baseline, threshold, startup_runs):
+    """Time every route through the test client: p50/p95/p99, queries per request, peak memory."""
+    try:
+        results = benchmark.run(app._get_current_object(), requests=n, warmup=warmup, username=username,
+                                include_exports=exports, echo=click.echo)
+        if startup_runs:
+            click.echo("")
+            results["startup"] = benchmark.startup(app._get_current_object(), runs=startup_runs,
+                                                   username=username, echo=click.echo)
+    except LookupError as exc:
+        raise click.ClickException(str(exc))
+    if out:
+        benchmark.save(results, out)
+        click.echo(f"Wrote {out}")
+    if baseline:
+        lines, regressions = benchmark.compare(benchmark.load(baseline), results, threshold)
+        click.echo("")
+        for line in lines:
+            click.echo(line)
+        if regressions:
+            raise click.ClickException(f"{len(regressions)} route(s) regressed: {', '.join(regressions)}")
+
+
+@app.cli.command("assets-build")
+def assets_build():
+    """Write the precompressed static files into STATIC_CACHE_DIR (a deploy step; workers only read them)."""
+    written = app.extensions["static_assets"].precompress()
+    click.echo(f"Wrote {written} precompressed files")
+
+
+@app.cli.command("rollups-rebuild")
+def rollups_rebuild():
+    """Recompute the daily sales and follow-up rollups behind the dashboard and reports."""
+    for table, count in rollups.rebuild().items():
+        click.echo(f"{table}: {count} rows")
+
+
+@app.cli.command("archive")
+@click.option("--batch-size", type=int, default=None, help="Rows per transaction (default: ARCHIVE_BATCH_SIZE)")
+@click.option("--dry-run", is_flag=True, help="Only count the rows that would be archived")
+def archive_old_rows(batch_size, dry_run):
+    """Move completed follow-ups and invoices past their ARCHIVE_*_AFTER_DAYS age to the archive tables."""
+    for entity, count in archive.run(app.config, batch_size=batch_size, dry_run=dry_run).items():
+        click.echo(f"{'Would archive' if dry_run else 'Archived'} {count} {entity}")
+
+
+@app.cli.command("search-reindex")
+def search_reindex():
+    """Rebuild the search index from the source tables."""
+    search.create_indexes()
+    for entity, count in search.rebuild().items():
+        click.echo(f"Indexed {count} {entity}")
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = "EXPLAIN QUERY PLAN " if compiler.dialect.name == "sqlite" else "EXPLAIN "
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def route_queries():
+    """The list/report queries issued by routes.py, keyed by a short label.
+
+    They come from the same helpers the routes call, with sample arguments.
+    """
+    year = datetime.now().year
+    lists = {
+        "followups": ("followups", {}),
+        "followups?status": ("followups", {"status": "pending"}),
+        "followups?user": ("followups", {"user": "1"}),
+        "followups?archived": ("followups", {"archived": "1"}),
+        "invoices": ("invoices", {}),
+        "invoices?archived": ("invoices", {"archived": "1"}),
+        "quotations": ("quotations", {}),
+        "products": ("products", {}),
+    }
+    queries = {}
+    for label, (name, args) in lists.items():
+        queries[label] = keyset_query(*filters.listing(name, MultiDict(args), bool(args.get("archived"))))
+    for kind, date_col, query in clients.timeline_queries(1):
+        archived = date_col.class_ in archive.ARCHIVES.values()
+        queries[f"client timeline {kind}s" + ("?archived" if archived else "")] = query
+    queries["dashboard followups/month"] = reporting.monthly_query("followups", year)
+    queries["dashboard invoices/month"] = reporting.monthly_query("invoices", year)
+    queries["reports sales/month"] = reporting.monthly_query("sales", year)
+    queries["reports status counts"] = reporting.status_counts_query(year)
+    return queries
+
+
+def _full_scans(dialect, plan_lines):
+    if dialect == "sqlite":
+        return [l for l in plan_lines
+                if l.startswith("SCAN ") and "USING" not in l]
+    return [l for l in plan_lines if "Seq Scan" in l]
+
+
+@app.cli.command("explain-queries")
+def explain_queries():
+    """Print the query plan of each route query and flag full table scans.
+
+    Postgres may legitimately prefer a sequential scan on small tables, so run
+    this against a database with realistic volumes.
+    """
+    dialect = db.engine.dialect.name
+    flagged = 0
+    for label, query in route_queries().items():
+        rows = db.session.execute(Explain(query.statement)).all()
+        # SQLite rows are (id, parent, notused, detail); Postgres rows are one text column
+        lines = [str(row[-1]) for row in rows]
+        scans = _full_scans(dialect, lines)
+        flagged += bool(scans)
+        click.echo(f"{'SCAN' if scans else 'ok  '}  {label}")
+        for line in lines:
+            click.echo(f"        {line}")
+    if flagged:
+        raise click.ClickException(f"{flagged} queries fall back to a full table scan")
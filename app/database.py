@@ -0,0 +1,118 @@
+"""Engine tuning and read-replica routing.
+
+Pool sizes, pre-ping, recycling and the statement timeout come from the
+environment (see config.py). On SQLite, every new connection is switched to
+WAL with relaxed fsync, which lets readers carry on while a request writes.
+
+Pooled connections never cross a fork: a child process (a gunicorn worker
+forked from a --preload master, or a PDF export worker) starts with empty
+pools instead of sharing the parent's sockets.
+
+When DATABASE_REPLICA_URL is set, GET requests to views marked with
+@replica_reads send their queries to the replica. Writes always go to the
+primary, and so does every read from a browser that wrote something in the
+last REPLICA_STICKY_SECONDS, so users see their own changes despite
+replication lag.
+"""
+import os
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session as BaseSession
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+
+REPLICA = "replica"
+_WRITE_KEY = "_db_write_at"
+
+
+class RoutingSession(BaseSession):
+    """db.session class that reads from the replica inside @replica_reads views."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get("replica_reads"):
+            engine = self._db.engines.get(REPLICA)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _recently_wrote():
+    wrote_at = flask_session.get(_WRITE_KEY)
+    return wrote_at is not None and time.time() - wrote_at < current_app.config.get("REPLICA_STICKY_SECONDS", 10)
+
+
+def replica_reads(fn):
+    """Serve this view's GET requests from the read replica, if one is configured."""
+    @wraps(fn)
+    def decorated_view(*args, **kwargs):
+        if (request.method in ("GET", "HEAD")
+                and REPLICA in current_app.config.get("SQLALCHEMY_BINDS", {})
+                and not _recently_wrote()):
+            g.replica_reads = True
+        return fn(*args, **kwargs)
+    return decorated_view
+
+
+# remember which browsers just wrote, so their next reads stay on the primary
+
+@event.listens_for(OrmSession, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _committed(session):
+    if session.info.pop("wrote", False) and has_request_context() and REPLICA in current_app.config.get("SQLALCHEMY_BINDS", {}):
+        flask_session[_WRITE_KEY] = time.time()
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _rolled_back(session):
+    session.info.pop("wrote", None)
+
+
+# ---------------- SQLite ----------------
+
+def _sqlite_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+    return on_connect
+
+
+def _dispose_after_fork(engines):
+    def dispose():
+        for engine in engines:
+            # close=False: leave the parent's connections alone, just stop using them
+            engine.dispose(close=False)
+    return dispose
+
+
+def init_app(app, db):
+    """Make the app's engines fork-safe and apply per-connection SQLite settings."""
+    with app.app_context():
+        engines = list(db.engines.values())
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_dispose_after_fork(engines))
+    if not app.config.get("SQLITE_WAL"):
+        return
+    pragmas = [
+        "journal_mode=WAL",
+        "synchronous=NORMAL",  # safe with WAL: only the last commits can be lost on power failure
+        f"busy_timeout={app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)}",
+        f"cache_size=-{app.config.get('SQLITE_CACHE_KB', 20000)}",
+        "temp_store=MEMORY",
+    ]
+    for engine in engines:
+        if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+            event.listen(engine, "connect", _sqlite_pragmas(pragmas))
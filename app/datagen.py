@@ -0,0 +1,172 @@
+"""Synthetic data for benchmarks and load tests (`flask seed-data`).
+
+Rows are generated lazily and written with executemany INSERTs in batches,
+so a million follow-ups need no more memory than one batch. Follow-ups,
+quotations and invoices are linked to generated clients exactly as the
+client resolution step would link them, and the search index is brought up
+to date at the end. A fixed --seed gives the same dataset every time, which
+keeps benchmark runs comparable. The report rollups are rebuilt at the end.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+
+from . import db, search, rollups
+from .clients import name_key
+from .models import User, Client, FollowUp, Product, Quotation, Invoice, InvoiceItem
+
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Meera", "Rohan",
+               "Saanvi", "Arjun", "Priya", "Rahul", "Neha", "Vikram", "Pooja", "Karan", "Sneha"]
+LAST_NAMES = ["Sharma", "Verma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Mehta", "Singh",
+              "Das", "Kapoor", "Joshi", "Rao", "Chopra", "Bose", "Malhotra"]
+PRODUCT_WORDS = ["Cloud", "CRM", "Backup", "Analytics", "Mail", "Storage", "Security", "Website",
+                 "Hosting", "Support", "Payroll", "Billing", "Domain", "SEO", "Mobile", "Desktop"]
+NOTES = ["Call back about pricing", "Sent brochure", "Wants a demo next week", "Asked for discount",
+         "Follow up on renewal", "Interested in premium plan", "Waiting for approval", None]
+
+
+class Generator:
+    def __init__(self, seed=42, years=2, batch_size=5000, echo=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.end = datetime.now().replace(microsecond=0)
+        self.start = self.end - timedelta(days=365 * years)
+        self.echo = echo or (lambda msg: None)
+        self.clients = []   # (id, name, phone)
+        self.products = []  # (name, details, price)
+        self.user_ids = []
+
+    def _when(self):
+        span = int((self.end - self.start).total_seconds())
+        return self.start + timedelta(seconds=self.rng.randrange(span))
+
+    def _insert(self, model, rows, returning=False):
+        """executemany INSERT of rows in batches; returns the new ids if asked."""
+        ids, batch = [], []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                ids += self._flush(model, batch, returning)
+                batch = []
+        if batch:
+            ids += self._flush(model, batch, returning)
+        return ids
+
+    def _flush(self, model, batch, returning):
+        if returning:
+            ids = list(db.session.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), batch))
+        else:
+            db.session.execute(insert(model), batch)
+            ids = []
+        db.session.commit()
+        return ids
+
+    def add_users(self, count):
+        from werkzeug.security import generate_password_hash
+        existing = {u for (u,) in db.session.query(User.username)}
+        password = generate_password_hash("bench123")
+        rows = [{"username": f"sales{n}", "password_hash": password, "role": "Sales"}
+                for n in range(1, count + 1) if f"sales{n}" not in existing]
+        # `flask benchmark` logs in as the first Admin
+        if "benchadmin" not in existing:
+            rows.append({"username": "benchadmin", "password_hash": password, "role": "Admin"})
+        self._insert(User, rows)
+        self.user_ids = [u for (u,) in db.session.query(User.id).filter(User.role == "Sales")] or [None]
+        self.echo(f"users: {len(rows)} created")
+
+    def add_clients(self, count):
+        first_phone = 7000000000 + (db.session.query(func.count(Client.id)).scalar() or 0)
+
+        def rows():
+            for n in range(count):
+                name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)} {n}"
+                phone = str(first_phone + n)
+                yield {"name": name, "phone": phone, "name_key": name_key(name), "phone_key": "91" + phone}
+
+        generated = list(rows()) if count else []
+        ids = self._insert(Client, generated, returning=True)
+        self.clients = [(i, r["name"], r["phone"]) for i, r in zip(ids, generated)]
+        self.echo(f"clients: {len(ids)}")
+
+    def add_products(self, count):
+        rows = []
+        for n in range(count):
+            name = f"{self.rng.choice(PRODUCT_WORDS)} {self.rng.choice(PRODUCT_WORDS)} {n}"
+            rows.append({"name": name, "details": f"{name} plan", "website_price": round(self.rng.uniform(99, 99999), 2)})
+        self._insert(Product, rows)
+        self.products = [(r["name"], r["details"], r["website_price"]) for r in rows] or [("Service", None, 999.0)]
+        self.echo(f"products: {count}")
+
+    def add_followups(self, count):
+        def rows():
+            for _ in range(count):
+                client_id, name, phone = self.rng.choice(self.clients)
+                when = self._when()
+                yield {
+                    "client_name": name, "client_phone": phone, "client_id": client_id,
+                    "followup_datetime": when, "note": self.rng.choice(NOTES),
+                    "status": "completed" if when < self.end - timedelta(days=7) and self.rng.random() < 0.8 else "pending",
+                    "user_id": self.rng.choice(self.user_ids),
+                }
+        self._insert(FollowUp, rows())
+        self.echo(f"follow-ups: {count}")
+
+    def add_quotations(self, count):
+        def rows():
+            for _ in range(count):
+                client_id, name, phone = self.rng.choice(self.clients)
+                product, details, price = self.rng.choice(self.products)
+                yield {
+                    "client_name": name, "client_phone": phone, "client_id": client_id,
+                    "product_name": product, "product_details": details,
+                    "website_price": price, "created_at": self._when(),
+                }
+        self._insert(Quotation, rows())
+        self.echo(f"quotations: {count}")
+
+    def add_invoices(self, count, max_items=5):
+        done = 0
+        while done < count:
+            n = min(self.batch_size, count - done)
+            invoices, lines = [], []
+            for _ in range(n):
+                client_id, name, _ = self.rng.choice(self.clients)
+                items = []
+                for _ in range(self.rng.randint(1, max_items)):
+                    product, _, price = self.rng.choice(self.products)
+                    qty = self.rng.randint(1, 10)
+                    items.append({"name": product, "qty": qty, "price": price, "line_total": qty * price})
+                subtotal = sum(i["line_total"] for i in items)
+                tax = self.rng.choice([0, 5, 12, 18])
+                invoices.append({
+                    "client_name": name, "client_id": client_id, "created_at": self._when(),
+                    "tax_percent": tax, "subtotal": subtotal, "total": subtotal * (1 + tax / 100.0),
+                })
+                lines.append(items)
+            ids = self._insert(Invoice, invoices, returning=True)
+            self._insert(InvoiceItem, (dict(item, invoice_id=invoice_id)
+                                       for invoice_id, items in zip(ids, lines) for item in items))
+            done += n
+        self.echo(f"invoices: {count}")
+
+
+def generate(clients=1000, products=200, followups=10000, quotations=2000, invoices=2000,
+             max_items=5, users=5, years=2, seed=42, batch_size=5000, echo=None):
+    """Add a synthetic dataset of the given volumes to the current database."""
+    gen = Generator(seed=seed, years=years, batch_size=batch_size, echo=echo)
+    last_ids = {entity: db.session.query(func.max(model.id)).scalar() or 0
+                for entity, (model, _) in search.SOURCES.items()}
+    gen.add_users(users)
+    gen.add_clients(max(clients, 1))
+    gen.add_products(products)
+    gen.add_followups(followups)
+    gen.add_quotations(quotations)
+    gen.add_invoices(invoices, max_items=max_items)
+    # executemany inserts skip the search flush hook
+    for entity, last_id in last_ids.items():
+        search.reindex(entity, after_id=last_id)
+        db.session.commit()
+    gen.echo("search index updated")
+    rollups.rebuild()
+    gen.echo("report rollups rebuilt")
@@ -0,0 +1,163 @@
+"""Streaming CSV/JSON exports of the list pages.
+
+Rows are fetched as plain column tuples with yield_per, which uses a
+server-side cursor where the driver supports one, and are encoded a chunk at
+a time by generators. Memory stays flat however many rows match, and the
+first bytes go out as soon as the first chunk is ready.
+
+Follow-ups and invoices moved out by app/archive.py are exported from the
+archive tables instead with archived=True (?archived=1 on the export URLs).
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from .archive import ARCHIVES
+from .models import FollowUp, Product, Quotation, Invoice, InvoiceItem
+
+BATCH_SIZE = 1000
+CHUNK_ROWS = 500
+
+# entity -> (model, columns, ordering, descending); ordering matches the list pages
+ENTITIES = {
+    "followups": (
+        FollowUp,
+        ["id", "client_name", "client_phone", "followup_datetime", "note", "status", "user_id"],
+        ["followup_datetime", "id"], True,
+    ),
+    "quotations": (
+        Quotation,
+        ["id", "client_name", "client_phone", "product_name", "product_details", "website_price",
+         "created_at", "product_id"],
+        ["created_at", "id"], True,
+    ),
+    "products": (
+        Product,
+        ["id", "name", "details", "website_price"],
+        ["name", "id"], False,
+    ),
+    "invoices": (
+        Invoice,
+        ["id", "client_name", "created_at", "tax_percent", "subtotal", "total"],
+        ["created_at", "id"], True,
+    ),
+}
+
+INVOICE_ITEM_COLUMNS = ["name", "qty", "price", "line_total"]
+
+
+def _model(entity, archived=False):
+    model = ENTITIES[entity][0]
+    return ARCHIVES[model] if archived else model
+
+
+def _columns(entity, model):
+    return [getattr(model, name) for name in ENTITIES[entity][1]]
+
+
+def _ordering(entity, model):
+    _, _, ordering, descending = ENTITIES[entity]
+    columns = [getattr(model, name) for name in ordering]
+    return [c.desc() for c in columns] if descending else columns
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_records(entity, query, archived=False):
+    """Yield one dict per row of query (a filtered, unordered query of entity)."""
+    model = _model(entity, archived)
+    names = ENTITIES[entity][1]
+    rows = (query.with_entities(*_columns(entity, model)).order_by(*_ordering(entity, model))
+            .yield_per(BATCH_SIZE))
+    for row in rows:
+        yield {name: _plain(v) for name, v in zip(names, row)}
+
+
+def iter_invoice_lines(query, archived=False):
+    """Yield (invoice dict, item dict or None) per line item, invoices in list order."""
+    model = _model("invoices", archived)
+    item = ARCHIVES[InvoiceItem] if archived else InvoiceItem
+    columns = _columns("invoices", model)
+    names = ENTITIES["invoices"][1]
+    item_names = ["item_" + name for name in INVOICE_ITEM_COLUMNS]
+    rows = (query.outerjoin(item, item.invoice_id == model.id)
+            .with_entities(*columns, item.id, *[getattr(item, name) for name in INVOICE_ITEM_COLUMNS])
+            .order_by(*_ordering("invoices", model), item.id)
+            .yield_per(BATCH_SIZE))
+    n = len(columns)
+    for row in rows:
+        invoice = {name: _plain(v) for name, v in zip(names, row[:n])}
+        item = None
+        if row[n] is not None:
+            item = dict(zip(item_names, row[n + 1:]))
+        yield invoice, item
+
+
+def _nested_invoices(lines):
+    current, items = None, []
+    for invoice, item in lines:
+        if current is not None and invoice["id"] != current["id"]:
+            yield dict(current, items=items)
+            items = []
+        current = invoice
+        if item:
+            items.append({k[len("item_"):]: v for k, v in item.items()})
+    if current is not None:
+        yield dict(current, items=items)
+
+
+def _flat_invoice_lines(lines):
+    empty = {"item_" + name: None for name in INVOICE_ITEM_COLUMNS}
+    for invoice, item in lines:
+        yield dict(invoice, **(item or empty))
+
+
+def header(entity):
+    names = list(ENTITIES[entity][1])
+    if entity == "invoices":
+        names += ["item_" + name for name in INVOICE_ITEM_COLUMNS]
+    return names
+
+
+def stream_csv(fieldnames, records):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames)
+    writer.writeheader()
+    for n, record in enumerate(records, start=1):
+        writer.writerow(record)
+        if n % CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def stream_json(records):
+    yield "["
+    chunk = []
+    first = True
+    for record in records:
+        chunk.append(json.dumps(record))
+        if len(chunk) >= CHUNK_ROWS:
+            yield ("" if first else ",") + ",".join(chunk)
+            first, chunk = False, []
+    if chunk:
+        yield ("" if first else ",") + ",".join(chunk)
+    yield "]"
+
+
+def stream(entity, query, fmt, archived=False):
+    """Text chunks of the export in fmt ("csv" or "json"); archived if query is on the archive table."""
+    if entity == "invoices":
+        lines = iter_invoice_lines(query, archived)
+        records = _nested_invoices(lines) if fmt == "json" else _flat_invoice_lines(lines)
+    else:
+        records = iter_records(entity, query, archived)
+    if fmt == "json":
+        return stream_json(records)
+    return stream_csv(header(entity), records)
@@ -0,0 +1,58 @@
+"""Query-string filters shared by the list pages and their exports.
+
+Each function takes request args and returns an unordered query, so callers
+can paginate, export or count it as they need. Follow-ups and invoices can be
+filtered in their archive table instead by passing its model. listing() adds
+the sort columns each list page paginates by, for the pages and for
+`flask explain-queries` alike.
+"""
+from .archive import ARCHIVES
+from .models import FollowUp, Product, Quotation, Invoice
+from .reporting import parse_date, date_filters
+
+
+def followups(args, model=FollowUp):
+    query = model.query
+    status = args.get("status", "").lower()
+    if status:
+        query = query.filter(model.status == status)
+    user_id = args.get("user", type=int)
+    if user_id:
+        query = query.filter(model.user_id == user_id)
+    start, end = parse_date(args.get("start")), parse_date(args.get("end"))
+    return query.filter(*date_filters(model.followup_datetime, start=start, end=end))
+
+
+def quotations(args, model=Quotation):
+    start, end = parse_date(args.get("start")), parse_date(args.get("end"))
+    return model.query.filter(*date_filters(model.created_at, start=start, end=end))
+
+
+def invoices(args, model=Invoice):
+    start, end = parse_date(args.get("start")), parse_date(args.get("end"))
+    return model.query.filter(*date_filters(model.created_at, start=start, end=end))
+
+
+def products(args, model=Product):
+    query = model.query
+    q = args.get("q", "").strip()
+    if q:
+        query = query.filter(model.name.startswith(q, autoescape=True))
+    return query
+
+
+# list page -> (filter, model, sort column, descending)
+LISTS = {
+    "followups": (followups, FollowUp, "followup_datetime", True),
+    "quotations": (quotations, Quotation, "created_at", True),
+    "invoices": (invoices, Invoice, "created_at", True),
+    "products": (products, Product, "name", False),
+}
+
+
+def listing(name, args, archived=False):
+    """(query, sort column, id column, descending) of a list page, as keyset_paginate() takes them."""
+    filter_, model, sort, descending = LISTS[name]
+    if archived:
+        model = ARCHIVES[model]
+    return filter_(args, model), getattr(model, sort), model.id, descending
@@ -1,8 +1,9 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, TextAreaField, DateField, TimeField, SubmitField, IntegerField, FloatField, SelectField
+from wtforms import StringField, PasswordField, TextAreaField, DateField, TimeField, SubmitField, IntegerField, FloatField, SelectField, HiddenField
 
 
-from wtforms.validators import DataRequired, Length, Email, EqualTo, NumberRange
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms.validators import DataRequired, Length, Email, EqualTo, NumberRange, Optional, ValidationError
 
 
 
@@ -26,6 +27,32 @@ class FollowUpForm(FlaskForm):
     submit = SubmitField("Schedule Follow-up")
 
 
+class FollowUpBulkForm(FlaskForm):
+    action = SelectField("Action", choices=[("complete","Mark done"),("reschedule","Reschedule"),("reassign","Reassign")])
+    scope = SelectField("Apply to", choices=[("selected","Selected follow-ups"),("filter","Everything matching the filter")])
+    followup_date = DateField("New Date", format="%Y-%m-%d", validators=[Optional()])
+    followup_time = TimeField("New Time", format="%H:%M", validators=[Optional()])
+    # only rendered for managers, so Sales posts arrive without it
+    user_id = SelectField("Assign to", coerce=int, choices=[(0, "Assign to...")],
+                          validators=[Optional()], validate_choice=False)
+    submit = SubmitField("Apply")
+
+    def validate_user_id(self, field):
+        if field.data and field.data not in dict(field.choices):
+            raise ValidationError("Not a valid choice.")
+
+    def validate_action(self, field):
+        if field.data == "reschedule" and not (self.followup_date.data and self.followup_time.data):
+            raise ValidationError("Pick the new date and time")
+        if field.data == "reassign" and not self.user_id.data:
+            raise ValidationError("Pick a user to assign to")
+
+
+class ClientForm(FlaskForm):
+    name = StringField("Client Name", validators=[DataRequired(), Length(max=150)])
+    phone = StringField("Phone", validators=[Length(max=20)])
+
+
 class ProductForm(FlaskForm):
     name = StringField("Product Name", validators=[DataRequired()])
     details = TextAreaField("Details")
@@ -35,11 +62,28 @@ class ProductForm(FlaskForm):
 class QuotationForm(FlaskForm):
     client_name = StringField("Client Name", validators=[DataRequired()])
     client_phone = StringField("Client Phone", validators=[DataRequired(), Length(min=10, max=15)])
-    product_name = StringField("Product Name", validators=[DataRequired()])
+    # set by the product typeahead; blank name/details/price are then taken from the catalog
+    product_id = HiddenField()
+    product_name = StringField("Product Name")
     product_details = TextAreaField("Product Details")
-    website_price = FloatField("Website Price", validators=[NumberRange(min=0)], default=0.0)
+    website_price = FloatField("Website Price", validators=[Optional(), NumberRange(min=0)], default=0.0)
     submit = SubmitField("Create Quotation")
 
+    def validate_product_id(self, field):
+        from .catalog import product_catalog
+        if field.data:
+            product = product_catalog.get(int(field.data)) if field.data.isdigit() else None
+            if product is None:
+                raise ValidationError("Unknown product")
+            self.product = product
+        elif not (self.product_name.data or "").strip():
+            raise ValidationError("Pick a product or enter its name")
+
+class ImportForm(FlaskForm):
+    entity = SelectField("Import", choices=[("clients","Clients"),("products","Products"),("followups","Follow-ups")])
+    file = FileField("CSV or Excel file", validators=[FileRequired(), FileAllowed(["csv", "xlsx"], "CSV or .xlsx only")])
+    submit = SubmitField("Start Import")
+
 class InvoiceForm(FlaskForm):
     client_name = StringField("Client Name", validators=[DataRequired()])
     item_name = StringField("Item Name", validators=[DataRequired()])
@@ -0,0 +1,201 @@
+"""Streaming bulk import of clients, products and follow-ups from CSV/Excel.
+
+Rows are read one at a time, validated with the same WTForms forms the UI
+uses, and inserted in executemany batches. Each batch commits together with
+the ImportRun progress counter, so a failed import resumes after the last
+committed row instead of starting over. Rows that fail validation are
+written to a per-run error CSV in the imports directory rather than kept in
+memory.
+
+Uploads are saved by the web process and read by the jobs worker, and the
+worker writes the error CSV the web process serves: when the two run on
+different machines or dynos, IMPORT_DIR must be storage both can see.
+"""
+import csv
+import hashlib
+import os
+from datetime import date, datetime, time
+
+from sqlalchemy import func, insert
+from flask import current_app
+from werkzeug.datastructures import MultiDict
+
+from . import db, search, clients, rollups
+from .forms import ClientForm, ProductForm, FollowUpForm
+from .models import Client, Product, FollowUp, ImportRun
+
+
+def _client_values(form, user_id):
+    return {"name": form.name.data, "phone": form.phone.data or None}
+
+
+def _product_values(form, user_id):
+    return {"name": form.name.data, "details": form.details.data, "website_price": form.website_price.data}
+
+
+def _followup_values(form, user_id):
+    return {
+        "client_name": form.client_name.data,
+        "client_phone": form.client_phone.data,
+        "followup_datetime": datetime.combine(form.followup_date.data, form.followup_time.data),
+        "note": form.note.data,
+        "status": "pending",
+        "user_id": user_id,
+    }
+
+
+# entity -> (validation form, model, form -> column values)
+ENTITIES = {
+    "clients": (ClientForm, Client, _client_values),
+    "products": (ProductForm, Product, _product_values),
+    "followups": (FollowUpForm, FollowUp, _followup_values),
+}
+
+
+def imports_dir():
+    path = current_app.config.get("IMPORT_DIR") or os.path.join(current_app.instance_path, "imports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def error_path(run):
+    return os.path.join(imports_dir(), f"import_{run.id}_errors.csv")
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cell_str(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, time):
+        return value.strftime("%H:%M")
+    return str(value).strip()
+
+
+def iter_rows(path):
+    """Yield each data row of a CSV or .xlsx file as a {header: str} dict."""
+    if path.lower().endswith(".xlsx"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("Excel import needs openpyxl: pip install openpyxl")
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [_cell_str(c) for c in next(rows, ())]
+            for values in rows:
+                yield {h: _cell_str(v) for h, v in zip(header, values) if h}
+        finally:
+            wb.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as fh:
+            for row in csv.DictReader(fh):
+                yield {k.strip(): (v or "").strip() for k, v in row.items() if k}
+
+
+def validate_row(entity, row, user_id=None):
+    """Return (values, None) for a valid row or (None, errors) otherwise."""
+    form_class, _, to_values = ENTITIES[entity]
+    formdata = MultiDict({k: v for k, v in row.items() if v != ""})
+    form = form_class(formdata=formdata, meta={"csrf": False})
+    if not form.validate():
+        errors = {name: msgs for name, msgs in form.errors.items() if name != "submit"}
+        return None, errors
+    return to_values(form, user_id), None
+
+
+def start_run(entity, path, user_id=None, resume=True):
+    """Create an ImportRun, or pick up an unfinished one for the same file."""
+    if entity not in ENTITIES:
+        raise ValueError(f"Unknown import entity: {entity}")
+    digest = file_hash(path)
+    if resume:
+        run = (ImportRun.query
+               .filter(ImportRun.entity == entity, ImportRun.file_hash == digest,
+                       ImportRun.status != "done")
+               .order_by(ImportRun.id.desc())
+               .first())
+        if run is not None:
+            run.status = "running"
+            db.session.commit()
+            return run
+    run = ImportRun(entity=entity, filename=os.path.basename(path), file_hash=digest, user_id=user_id)
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+
+def import_file(run, path, batch_size=1000):
+    """Import every row of path after run.rows_done, committing per batch."""
+    _, model, _ = ENTITIES[run.entity]
+    errors_path = error_path(run)
+    run.error_file = os.path.basename(errors_path)
+    skip = run.rows_done
+    batch, batch_errors = [], []
+    row_no = 0
+
+    def flush(err_writer):
+        nonlocal batch, batch_errors
+        inserted = len(batch)
+        if batch and run.entity == "clients":
+            # rows matching an existing client (by phone, else name) are not duplicated
+            _, inserted = clients.resolve_many([(v["name"], v["phone"]) for v in batch])
+        elif batch:
+            if run.entity == "followups":
+                client_ids, _ = clients.resolve_many([(v["client_name"], v["client_phone"]) for v in batch])
+                for values, client_id in zip(batch, client_ids):
+                    values["client_id"] = client_id
+            last_id = db.session.query(func.max(model.id)).scalar()
+            db.session.execute(insert(model), batch)
+            # executemany inserts skip the search and rollup flush hooks
+            search.reindex(run.entity, after_id=last_id or 0)
+            if run.entity == "followups":
+                rollups.add_followups(batch)
+        run.rows_done = row_no
+        run.inserted += inserted
+        run.failed += len(batch_errors)
+        db.session.commit()
+        # errors are only recorded once their batch is committed, so a resumed
+        # run never reports the same row twice
+        err_writer.writerows(batch_errors)
+        batch, batch_errors = [], []
+
+    try:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Upload {path} not found: IMPORT_DIR must be storage shared by "
+                                    "the web and worker processes")
+        new_file = not os.path.exists(errors_path)
+        with open(errors_path, "a", newline="", encoding="utf-8") as err_fh:
+            err_writer = csv.writer(err_fh)
+            if new_file:
+                err_writer.writerow(["row", "errors"])
+            for row_no, row in enumerate(iter_rows(path), start=1):
+                if row_no <= skip:
+                    continue
+                values, errors = validate_row(run.entity, row, run.user_id)
+                if errors:
+                    batch_errors.append([row_no, "; ".join(f"{f}: {', '.join(m)}" for f, m in errors.items())])
+                else:
+                    batch.append(values)
+                if len(batch) + len(batch_errors) >= batch_size:
+                    flush(err_writer)
+            flush(err_writer)
+        run.status = "done"
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        run.status = "failed"
+        db.session.commit()
+        raise
+    return run
@@ -0,0 +1,212 @@
+"""Database-backed background jobs.
+
+Slow work is recorded as a Job row and picked up by `flask jobs-worker`, a
+separate process (see Procfile) that needs nothing but the application
+database. Jobs are claimed with a conditional UPDATE so several workers can
+poll the same table safely on SQLite and Postgres alike. Failed jobs are
+retried with exponential backoff up to max_attempts; jobs left "running" by a
+crashed worker are requeued once their lock expires.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from . import db
+from .models import Job
+
+# kind -> (function, concurrency limit or None)
+HANDLERS = {}
+
+
+def job(kind, concurrency=None):
+    """Register a function as the handler for jobs of this kind.
+
+    The function receives the job's JSON payload as keyword arguments and may
+    return a JSON-serializable result.
+    """
+    def wrapper(fn):
+        HANDLERS[kind] = (fn, concurrency)
+        return fn
+    return wrapper
+
+
+def enqueue(kind, user_id=None, **payload):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    j = Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        user_id=user_id,
+        max_attempts=current_app.config.get("JOB_MAX_ATTEMPTS", 3),
+    )
+    db.session.add(j)
+    db.session.commit()
+    return j
+
+
+def requeue_stale():
+    """Return jobs whose worker died mid-run to the queue."""
+    timeout = current_app.config.get("JOB_LOCK_TIMEOUT", 600)
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+    count = (Job.query
+             .filter(Job.status == "running", Job.locked_at < cutoff)
+             .update({"status": "queued", "locked_by": None, "locked_at": None},
+                     synchronize_session=False))
+    db.session.commit()
+    return count
+
+
+def _saturated_kinds():
+    limited = {kind: limit for kind, (_, limit) in HANDLERS.items() if limit}
+    if not limited:
+        return []
+    running = dict(db.session.query(Job.kind, db.func.count(Job.id))
+                   .filter(Job.status == "running", Job.kind.in_(limited))
+                   .group_by(Job.kind)
+                   .all())
+    return [kind for kind, limit in limited.items() if running.get(kind, 0) >= limit]
+
+
+def claim_next(worker_id):
+    """Atomically mark the next runnable job as ours and return it, or None."""
+    now = datetime.utcnow()
+    saturated = _saturated_kinds()
+    for _ in range(5):
+        query = Job.query.filter(Job.status == "queued", Job.run_at <= now)
+        if saturated:
+            query = query.filter(Job.kind.notin_(saturated))
+        candidate = query.order_by(Job.run_at, Job.id).with_entities(Job.id).first()
+        if candidate is None:
+            return None
+        claimed = (Job.query
+                   .filter(Job.id == candidate.id, Job.status == "queued")
+                   .update({"status": "running", "locked_by": worker_id, "locked_at": now,
+                            "attempts": Job.attempts + 1},
+                           synchronize_session=False))
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, candidate.id)
+        # another worker won the race; try the next candidate
+    return None
+
+
+def run(j):
+    fn, _ = HANDLERS.get(j.kind, (None, None))
+    try:
+        if fn is None:
+            raise LookupError(f"No handler registered for job kind {j.kind!r}")
+        result = fn(**json.loads(j.payload or "{}"))
+    except Exception:
+        db.session.rollback()
+        j.error = traceback.format_exc(limit=5)
+        if j.attempts < j.max_attempts:
+            j.status = "queued"
+            j.run_at = datetime.utcnow() + timedelta(seconds=2 ** j.attempts * 5)
+        else:
+            j.status = "failed"
+            j.finished_at = datetime.utcnow()
+    else:
+        j.status = "done"
+        j.result = json.dumps(result) if result is not None else None
+        j.error = None
+        j.finished_at = datetime.utcnow()
+    j.locked_by = None
+    j.locked_at = None
+    db.session.commit()
+    return j
+
+
+def work(app, concurrency=1, poll_interval=1.0, once=False):
+    """Run worker threads until interrupted (or until the queue is empty, with once)."""
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = threading.Event()
+
+    def loop(n):
+        worker_id = f"{base_id}:{n}"
+        with app.app_context():
+            while not stop.is_set():
+                j = claim_next(worker_id)
+                if j is None:
+                    if once:
+                        return
+                    stop.wait(poll_interval)
+                    continue
+                app.logger.info("job %s (%s) attempt %s", j.id, j.kind, j.attempts)
+                run(j)
+                db.session.remove()
+
+    with app.app_context():
+        requeue_stale()
+    threads = [threading.Thread(target=loop, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+def results_dir():
+    path = current_app.config.get("JOB_RESULTS_DIR") or os.path.join(current_app.instance_path, "job_results")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# ---------------- Job handlers ----------------
+
+@job("export_invoice_pdfs", concurrency=1)
+def export_invoice_pdfs(start, end):
+    from . import pdf
+    from .reporting import parse_date
+    start, end = parse_date(start), parse_date(end)
+    filename = f"invoices_{start}_{end}_{int(time.time())}.zip"
+    path = os.path.join(results_dir(), filename)
+    with open(path + ".tmp", "wb") as fh:
+        for chunk in pdf.export_invoices_zip(start, end, workers=current_app.config.get("INVOICE_EXPORT_WORKERS")):
+            fh.write(chunk)
+    os.replace(path + ".tmp", path)
+    return {"file": filename}
+
+
+@job("import_file", concurrency=1)
+def import_file(run_id, path):
+    from . import importer
+    from .models import ImportRun
+    run = db.session.get(ImportRun, run_id)
+    importer.import_file(run, path, batch_size=current_app.config.get("IMPORT_BATCH_SIZE", 1000))
+    return {"inserted": run.inserted, "failed": run.failed}
+
+
+@job("backfill_clients", concurrency=1)
+def backfill_clients():
+    from . import clients
+    return {"linked": clients.backfill()}
+
+
+@job("archive", concurrency=1)
+def archive_old_rows():
+    """Move old completed follow-ups and invoices to the archive tables (see ARCHIVE_* settings)."""
+    from . import archive
+    return archive.run(current_app.config)
+
+
+@job("render_invoice_pdf")
+def render_invoice_pdf(invoice_id):
+    """Pre-render an invoice into PDF storage so the first download is instant."""
+    from . import archive, pdf
+    invoice = archive.get_invoice(invoice_id)
+    if invoice is None:
+        return None
+    snapshot = pdf.invoice_snapshot(invoice)
+    digest = pdf.fingerprint(snapshot)
+    pdf.get_or_render(current_app.extensions["pdf_storage"], snapshot, digest).close()
+    return {"fingerprint": digest}
@@ -0,0 +1,205 @@
+"""Opt-in request instrumentation (INSTRUMENTATION=1).
+
+For every request this records the total time, the number of SQL statements
+and the time spent in them (from SQLAlchemy engine events), and the template
+render time. The figures are sent back in a Server-Timing header, which the
+browser dev tools show next to each request, and are aggregated per endpoint
+for Prometheus at /metrics, which is only served to scrapers presenting
+METRICS_TOKEN (without a token it is not registered at all). Statements slower than SLOW_QUERY_MS are logged
+with the route that issued them, and requests issuing more than
+QUERY_COUNT_WARN statements (usually an N+1 loop) are logged too.
+
+Figures are kept per process, so with several gunicorn workers each scrape
+sees the worker that answered it.
+"""
+import hmac
+import logging
+import threading
+import time
+
+from flask import g, has_request_context, request, abort, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.metrics")
+
+# request duration histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    """Thread-safe per-endpoint counters, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}   # (endpoint, method, status) -> count
+        self.durations = {}  # endpoint -> [count per bucket..., +Inf count, sum]
+        self.sql = {}        # endpoint -> [statements, seconds]
+        self.templates = {}  # endpoint -> seconds
+        self.slow = {}       # endpoint -> slow statements
+
+    def observe_request(self, endpoint, method, status, seconds, queries, sql_seconds, template_seconds):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            hist = self.durations.setdefault(endpoint, [0] * (len(BUCKETS) + 1) + [0.0])
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[len(BUCKETS)] += 1
+            hist[-1] += seconds
+            sql = self.sql.setdefault(endpoint, [0, 0.0])
+            sql[0] += queries
+            sql[1] += sql_seconds
+            self.templates[endpoint] = self.templates.get(endpoint, 0.0) + template_seconds
+
+    def observe_slow_query(self, endpoint):
+        with self._lock:
+            self.slow[endpoint] = self.slow.get(endpoint, 0) + 1
+
+    def render(self):
+        with self._lock:
+            lines = [
+                "# HELP http_requests_total Requests handled, by endpoint, method and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            lines += [
+                "# HELP http_request_duration_seconds Time to produce the response, by endpoint.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for endpoint, hist in sorted(self.durations.items()):
+                for bound, count in zip(BUCKETS, hist):
+                    lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                total = hist[len(BUCKETS)]
+                lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {total}')
+                lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {hist[-1]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {total}')
+
+            lines += [
+                "# HELP sql_queries_total SQL statements executed while handling requests, by endpoint.",
+                "# TYPE sql_queries_total counter",
+            ]
+            lines += [f'sql_queries_total{{endpoint="{e}"}} {v[0]}' for e, v in sorted(self.sql.items())]
+            lines += [
+                "# HELP sql_query_seconds_total Time spent in SQL statements, by endpoint.",
+                "# TYPE sql_query_seconds_total counter",
+            ]
+            lines += [f'sql_query_seconds_total{{endpoint="{e}"}} {v[1]:.6f}' for e, v in sorted(self.sql.items())]
+            lines += [
+                "# HELP template_render_seconds_total Time spent rendering templates, by endpoint.",
+                "# TYPE template_render_seconds_total counter",
+            ]
+            lines += [f'template_render_seconds_total{{endpoint="{e}"}} {v:.6f}' for e, v in sorted(self.templates.items())]
+            lines += [
+                "# HELP sql_slow_queries_total Statements slower than SLOW_QUERY_MS, by endpoint.",
+                "# TYPE sql_slow_queries_total counter",
+            ]
+            lines += [f'sql_slow_queries_total{{endpoint="{e}"}} {v}' for e, v in sorted(self.slow.items())]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+_settings = {"slow_query_ms": 200}
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or "unmatched"
+    return "-"  # CLI commands and the jobs worker
+
+
+# ---------------- SQL ----------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = g.get("_metrics") if has_request_context() else None
+    if stats is not None:
+        stats["queries"] += 1
+        stats["sql"] += elapsed
+    if elapsed * 1000 >= _settings["slow_query_ms"]:
+        endpoint = _endpoint()
+        registry.observe_slow_query(endpoint)
+        route = request.path if has_request_context() else endpoint
+        logger.warning("slow query (%.1f ms) on %s: %s", elapsed * 1000, route, " ".join(statement.split()))
+
+
+def _handle_error(context):
+    # failed statements never reach after_cursor_execute
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+# ---------------- Templates ----------------
+
+def _before_render(sender, template, context, **extra):
+    stats = g.get("_metrics")
+    if stats is not None:
+        stats["template_started"] = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    stats = g.get("_metrics")
+    if stats is not None and stats.get("template_started"):
+        stats["templates"] += time.perf_counter() - stats.pop("template_started")
+
+
+# ---------------- Requests ----------------
+
+def _start_request():
+    g._metrics = {"started": time.perf_counter(), "queries": 0, "sql": 0.0, "templates": 0.0}
+
+
+def _finish_request(response):
+    stats = g.pop("_metrics", None)
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats["started"]
+    endpoint = _endpoint()
+    registry.observe_request(endpoint, request.method, response.status_code, elapsed,
+                             stats["queries"], stats["sql"], stats["templates"])
+    response.headers.add("Server-Timing", ", ".join([
+        f"app;dur={elapsed * 1000:.1f}",
+        f'db;dur={stats["sql"] * 1000:.1f};desc="{stats["queries"]} queries"',
+        f"tpl;dur={stats['templates'] * 1000:.1f}",
+    ]))
+    warn_at = _settings.get("query_count_warn")
+    if warn_at and stats["queries"] > warn_at:
+        logger.warning("%s %s ran %d SQL statements (possible N+1)", request.method, request.path, stats["queries"])
+    return response
+
+
+def metrics_view():
+    expected = f"Bearer {_settings['token']}"
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+        abort(401)
+    return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def init_app(app):
+    if not app.config.get("INSTRUMENTATION"):
+        return
+    _settings.update(
+        slow_query_ms=app.config.get("SLOW_QUERY_MS", 200),
+        query_count_warn=app.config.get("QUERY_COUNT_WARN", 50),
+        token=app.config.get("METRICS_TOKEN"),
+    )
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    if _settings["token"]:
+        app.add_url_rule("/metrics", "metrics", metrics_view)
+    else:
+        logger.info("METRICS_TOKEN is not set: /metrics is disabled")
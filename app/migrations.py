@@ -0,0 +1,246 @@
+"""Versioned schema migrations.
+
+Each migration is a (version, name, function) entry in MIGRATIONS and runs at
+most once per database; applied versions are recorded in schema_migration.
+Migrations must be idempotent, because version 1 creates the full current
+schema on a fresh database and later steps then find nothing to do. They
+must also only touch the columns that exist at their version: an older
+database runs them before later migrations add the rest of the model's
+columns, so they read and write with Core statements on explicit columns,
+never by loading ORM objects.
+"""
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, insert, inspect, select, text, update
+
+from . import db
+from .models import (Client, FollowUp, Product, Quotation, Invoice, InvoiceItem, Job, ImportRun, SearchDocument,
+                     SalesRollup, FollowUpRollup, FollowUpArchive, InvoiceArchive, InvoiceItemArchive,
+                     SchemaMigration)
+
+
+def add_missing_columns(table, columns):
+    """Add columns that db.create_all() cannot add to an existing table."""
+    existing = {c["name"] for c in inspect(db.engine).get_columns(table)}
+    added = []
+    for name, ddl in columns:
+        if name not in existing:
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+            added.append(name)
+    db.session.commit()
+    return added
+
+
+def create_missing_indexes(*models):
+    """Create the indexes declared in the models' __table_args__ if absent.
+
+    Indexes on columns a later migration adds are left to that migration.
+    """
+    for model in models:
+        existing = {c["name"] for c in inspect(db.engine).get_columns(model.__tablename__)}
+        for index in model.__table__.indexes:
+            if all(column.name in existing for column in index.columns):
+                index.create(db.engine, checkfirst=True)
+
+
+def backfill_invoice_items(batch_size=500):
+    """Move legacy JSON invoice items into InvoiceItem rows and persist totals.
+
+    Invoices whose subtotal is still NULL have not been migrated yet; they are
+    processed in id order, one batch per transaction, so an interrupted run
+    can simply be restarted. Totals are computed as in Invoice.recalculate().
+    """
+    invoices, items = Invoice.__table__, InvoiceItem.__table__
+    migrated = 0
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(invoices.c.id, invoices.c["items"], invoices.c.tax_percent)
+            .where(invoices.c.subtotal.is_(None), invoices.c.id > last_id)
+            .order_by(invoices.c.id)
+            .limit(batch_size)).all()
+        if not batch:
+            break
+        existing = defaultdict(list)
+        for item in db.session.execute(select(items.c.id, items.c.invoice_id, items.c.qty, items.c.price)
+                                       .where(items.c.invoice_id.in_([row.id for row in batch]))):
+            existing[item.invoice_id].append(item)
+        new_items, item_totals, totals = [], [], []
+        for invoice_id, items_json, tax_percent in batch:
+            if existing[invoice_id]:
+                lines = [{"qty": i.qty, "price": i.price} for i in existing[invoice_id]]
+                item_totals += [{"b_id": i.id, "line_total": i.qty * i.price} for i in existing[invoice_id]]
+            else:
+                try:
+                    legacy = json.loads(items_json or "[]")
+                except ValueError:
+                    legacy = []
+                lines = [{"name": i.get("name") or "Item", "qty": i.get("qty", 0), "price": i.get("price", 0)}
+                         for i in legacy]
+                new_items += [dict(line, invoice_id=invoice_id, line_total=line["qty"] * line["price"])
+                              for line in lines]
+            subtotal = sum(line["qty"] * line["price"] for line in lines)
+            totals.append({"b_id": invoice_id, "subtotal": subtotal,
+                           "total": subtotal + subtotal * ((tax_percent or 0) / 100.0)})
+            last_id = invoice_id
+        if new_items:
+            db.session.execute(insert(items), new_items)
+        if item_totals:
+            db.session.execute(update(items).where(items.c.id == bindparam("b_id")), item_totals)
+        db.session.execute(update(invoices).where(invoices.c.id == bindparam("b_id")), totals)
+        db.session.commit()
+        migrated += len(batch)
+    return migrated
+
+
+def backfill_created_at(table, now):
+    """Date rows without created_at like the closest earlier row (ids grow over time), else now.
+
+    Returns the number of rows filled in.
+    """
+    earlier = table.alias("earlier")
+    previous = (select(func.max(earlier.c.created_at))
+                .where(earlier.c.id < table.c.id, earlier.c.created_at.is_not(None))
+                .scalar_subquery())
+    result = db.session.execute(update(table).where(table.c.created_at.is_(None))
+                                .values(created_at=func.coalesce(previous, now)))
+    return result.rowcount
+
+
+def _initial_schema():
+    db.create_all()
+
+
+def _invoice_line_items():
+    add_missing_columns("invoice", [("subtotal", "FLOAT"), ("total", "FLOAT")])
+    backfill_invoice_items()
+
+
+def _normalize_followup_status():
+    FollowUp.query.filter(FollowUp.status == "Completed").update(
+        {"status": "completed"}, synchronize_session=False)
+    FollowUp.query.filter(FollowUp.status.is_(None)).update(
+        {"status": "pending"}, synchronize_session=False)
+    db.session.commit()
+
+
+def _hot_column_indexes():
+    create_missing_indexes(Client, FollowUp, Product, Quotation, Invoice, InvoiceItem)
+
+
+def _job_queue():
+    Job.__table__.create(db.engine, checkfirst=True)
+    create_missing_indexes(Job)
+
+
+def _import_runs():
+    ImportRun.__table__.create(db.engine, checkfirst=True)
+
+
+def _search_index():
+    from . import search
+    SearchDocument.__table__.create(db.engine, checkfirst=True)
+    search.create_indexes()
+    search.rebuild()
+
+
+def _client_links():
+    from . import clients, jobs
+    add_missing_columns("client", [("name_key", "VARCHAR(150)"), ("phone_key", "VARCHAR(20)")])
+    for table in ("follow_up", "quotation", "invoice"):
+        add_missing_columns(table, [("client_id", "INTEGER REFERENCES client (id)")])
+    # duplicates must go before the unique phone_key index exists
+    clients.normalize_clients()
+    create_missing_indexes(Client, FollowUp, Quotation, Invoice)
+    # linking existing rows can take a while on big tables: leave it to the worker
+    if any(db.session.query(model.id).filter(model.client_id.is_(None)).first() for model, _ in clients.LINKED):
+        jobs.enqueue("backfill_clients")
+
+
+def _followup_reminders():
+    add_missing_columns("follow_up", [("reminded_at", "DATETIME")])
+    create_missing_indexes(FollowUp)
+
+
+def _report_rollups():
+    from . import rollups
+    SalesRollup.__table__.create(db.engine, checkfirst=True)
+    FollowUpRollup.__table__.create(db.engine, checkfirst=True)
+    rollups.rebuild()
+
+
+def _archive_tables():
+    for model in (FollowUpArchive, InvoiceArchive, InvoiceItemArchive):
+        model.__table__.create(db.engine, checkfirst=True)
+
+
+def _created_at_not_null():
+    from . import rollups
+    # rows without a date never showed past the first page of the keyset-paginated lists
+    now = datetime.utcnow()
+    filled = sum(backfill_created_at(model.__table__, now) for model in (Quotation, Invoice, InvoiceArchive))
+    db.session.commit()
+    if db.engine.dialect.name == "postgresql":
+        for table in ("quotation", "invoice", "invoice_archive"):
+            db.session.execute(text(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL"))
+        db.session.commit()
+    # SQLite cannot add NOT NULL to an existing column; the column default keeps new rows dated
+    if filled:
+        rollups.rebuild()  # undated invoices were missing from the sales rollups
+
+
+def _quotation_products():
+    add_missing_columns("quotation", [("product_id", "INTEGER REFERENCES product (id) ON DELETE SET NULL")])
+
+
+def _followup_reschedules():
+    for table in ("follow_up", "follow_up_archive"):
+        add_missing_columns(table, [("rescheduled_at", "DATETIME")])
+    create_missing_indexes(FollowUp)
+
+
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "invoice line items and persisted totals", _invoice_line_items),
+    (3, "normalize follow-up status", _normalize_followup_status),
+    (4, "indexes for hot list/report columns", _hot_column_indexes),
+    (5, "background job queue", _job_queue),
+    (6, "bulk import progress", _import_runs),
+    (7, "search index", _search_index),
+    (8, "client links on follow-ups, quotations and invoices", _client_links),
+    (9, "follow-up reminders", _followup_reminders),
+    (10, "daily report rollups", _report_rollups),
+    (11, "archive tables for old follow-ups and invoices", _archive_tables),
+    (12, "created_at required on quotations and invoices", _created_at_not_null),
+    (13, "product link on quotations", _quotation_products),
+    (14, "follow-up reschedule times for reminders", _followup_reschedules),
+]
+
+
+def current_version():
+    if not inspect(db.engine).has_table(SchemaMigration.__tablename__):
+        return 0
+    return db.session.query(db.func.max(SchemaMigration.version)).scalar() or 0
+
+
+def pending_migrations():
+    version = current_version()
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def upgrade(echo=None, target=None):
+    """Apply every pending migration in order, up to target if given; returns the versions applied."""
+    applied = []
+    for version, name, fn in pending_migrations():
+        if target is not None and version > target:
+            break
+        if echo:
+            echo(f"Applying {version}: {name}")
+        fn()
+        SchemaMigration.__table__.create(db.engine, checkfirst=True)
+        db.session.add(SchemaMigration(version=version, name=name))
+        db.session.commit()
+        applied.append(version)
+    return applied
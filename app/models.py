@@ -3,6 +3,8 @@ from flask_login import UserMixin
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from . import login_manager
+from .cache import user_cache
+from flask import current_app
 from enum import Enum
 
 class RoleEnum(Enum):
@@ -28,14 +30,48 @@ class User(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # identity is cached per process; the returned User is transient and only
+    # carries id/username/role, which is all current_user is used for
+    user_id = int(user_id)
+    data = user_cache.get(user_id)
+    if data is None:
+        u = db.session.get(User, user_id)
+        if u is None:
+            return None
+        data = {"id": u.id, "username": u.username, "role": u.role}
+        ttl = current_app.config.get("USER_CACHE_TTL", 30)
+        if ttl:
+            user_cache.set(user_id, data, ttl=ttl)
+    return User(**data)
 
 class Client(db.Model):
+    __table_args__ = (
+        db.Index("ix_client_name", "name"),
+        db.Index("ix_client_phone", "phone"),
+        # match keys used to resolve free-text client details (see app/clients.py)
+        db.Index("ix_client_name_key", "name_key"),
+        db.Index("uq_client_phone_key", "phone_key", unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     phone = db.Column(db.String(20), nullable=True)
+    name_key = db.Column(db.String(150))  # lower-cased, whitespace-collapsed name
+    phone_key = db.Column(db.String(20))  # normalize_phone() digits
 
 class FollowUp(db.Model):
+    # match the list/report access paths: newest first, optionally by status or owner
+    __table_args__ = (
+        db.Index("ix_followup_datetime", "followup_datetime", "id"),
+        db.Index("ix_followup_status_datetime", "status", "followup_datetime", "id"),
+        db.Index("ix_followup_user_datetime", "user_id", "followup_datetime", "id"),
+        db.Index("ix_followup_client_datetime", "client_id", "followup_datetime", "id"),
+        # the reminder scheduler's due-queue scan
+        db.Index("ix_followup_due", "status", "reminded_at", "followup_datetime", "id"),
+        # and its per-tick read of recently rescheduled follow-ups
+        db.Index("ix_followup_rescheduled", "rescheduled_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     client_name = db.Column(db.String(100), nullable=False)
     client_phone = db.Column(db.String(15), nullable=False)
@@ -43,35 +79,201 @@ class FollowUp(db.Model):
     note = db.Column(db.Text)
     status = db.Column(db.String(20), default="pending")
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"))
+    reminded_at = db.Column(db.DateTime)  # set once the reminder is sent; cleared on reschedule
+    rescheduled_at = db.Column(db.DateTime)  # when followup_datetime last changed
 
 
 class Product(db.Model):
+    __table_args__ = (
+        db.Index("ix_product_name", "name", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     details = db.Column(db.Text)
     website_price = db.Column(db.Float, default=0.0)
 
 class Quotation(db.Model):
+    __table_args__ = (
+        db.Index("ix_quotation_created_at", "created_at", "id"),
+        db.Index("ix_quotation_client_created_at", "client_id", "created_at", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     client_name = db.Column(db.String(150), nullable=False)
     client_phone = db.Column(db.String(20), nullable=False)
     product_name = db.Column(db.String(150), nullable=False)
     product_details = db.Column(db.Text)
     website_price = db.Column(db.Float, default=0.0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"))
+    # the catalog product quoted, if picked from it; name/details/price above stay the quoted copy
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id", ondelete="SET NULL"))
 
 class Invoice(db.Model):
+    __table_args__ = (
+        db.Index("ix_invoice_created_at", "created_at", "id"),
+        db.Index("ix_invoice_client_created_at", "client_id", "created_at", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     client_name = db.Column(db.String(150), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    items = db.Column(db.Text)  # JSON string: list of {"name":..., "qty":..., "price":...}
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # legacy JSON string: list of {"name":..., "qty":..., "price":...}, kept for backfill only
+    items_json = db.Column("items", db.Text)
     tax_percent = db.Column(db.Float, default=0.0)
+    subtotal = db.Column(db.Float, default=0.0)
+    total = db.Column(db.Float, default=0.0)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"))
+
+    items = db.relationship("InvoiceItem", backref="invoice", order_by="InvoiceItem.id",
+                            cascade="all, delete-orphan")
+
+    def recalculate(self):
+        """Refresh line totals and the persisted subtotal/total from the line items."""
+        for item in self.items:
+            item.line_total = item.qty * item.price
+        self.subtotal = sum(item.line_total for item in self.items)
+        self.total = self.subtotal + self.subtotal * ((self.tax_percent or 0) / 100.0)
 
-    def subtotal(self):
+    @property
+    def tax_amount(self):
+        return (self.total or 0) - (self.subtotal or 0)
+
+class InvoiceItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    invoice_id = db.Column(db.Integer, db.ForeignKey("invoice.id"), nullable=False, index=True)
+    name = db.Column(db.String(150), nullable=False)
+    qty = db.Column(db.Integer, nullable=False, default=1)
+    price = db.Column(db.Float, nullable=False, default=0.0)
+    line_total = db.Column(db.Float, nullable=False, default=0.0)
+
+class Job(db.Model):
+    __table_args__ = (
+        db.Index("ix_job_status_run_at", "status", "run_at", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)  # JSON
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued/running/done/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
         import json
-        items = json.loads(self.items or "[]")
-        return sum(i["qty"] * i["price"] for i in items)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class ImportRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(30), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    file_hash = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default="running")  # running/failed/done
+    rows_done = db.Column(db.Integer, nullable=False, default=0)  # source rows committed so far
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    error_file = db.Column(db.String(255))
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class SearchDocument(db.Model):
+    """One searchable row per client, follow-up, quotation or product (see app/search.py)."""
+    __table_args__ = (
+        db.UniqueConstraint("entity", "ref_id", name="uq_search_document_ref"),
+        db.Index("ix_search_document_phone", "phone"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    ref_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(150))
+    body = db.Column(db.Text)
+    phone = db.Column(db.String(20))  # normalize_phone() digits
+
+class FollowUpArchive(db.Model):
+    """Completed follow-ups moved out of follow_up by app/archive.py, keeping their ids."""
+    __table_args__ = (
+        db.Index("ix_followup_archive_datetime", "followup_datetime", "id"),
+        db.Index("ix_followup_archive_client_datetime", "client_id", "followup_datetime", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    client_name = db.Column(db.String(100), nullable=False)
+    client_phone = db.Column(db.String(15), nullable=False)
+    followup_datetime = db.Column(db.DateTime, nullable=False)
+    note = db.Column(db.Text)
+    status = db.Column(db.String(20))
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"))
+    reminded_at = db.Column(db.DateTime)
+    rescheduled_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+class InvoiceArchive(db.Model):
+    """Old invoices moved out of invoice by app/archive.py, keeping their ids."""
+    __table_args__ = (
+        db.Index("ix_invoice_archive_created_at", "created_at", "id"),
+        db.Index("ix_invoice_archive_client_created_at", "client_id", "created_at", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    client_name = db.Column(db.String(150), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    items_json = db.Column("items", db.Text)
+    tax_percent = db.Column(db.Float)
+    subtotal = db.Column(db.Float)
+    total = db.Column(db.Float)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"))
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    items = db.relationship("InvoiceItemArchive", order_by="InvoiceItemArchive.id")
+
+    @property
+    def tax_amount(self):
+        return (self.total or 0) - (self.subtotal or 0)
+
+class InvoiceItemArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey("invoice_archive.id"), nullable=False, index=True)
+    name = db.Column(db.String(150), nullable=False)
+    qty = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    line_total = db.Column(db.Float, nullable=False)
+
+class SalesRollup(db.Model):
+    """Invoice count and sales total per day, kept current by app/rollups.py."""
+    day = db.Column(db.Date, primary_key=True)
+    invoices = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+
+class FollowUpRollup(db.Model):
+    """Follow-up count per day, owner and status (user_id 0 = unassigned), see app/rollups.py."""
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
 
-    def total(self):
-        s = self.subtotal()
-        return s + s * (self.tax_percent / 100.0)
+class SchemaMigration(db.Model):
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,108 @@
+"""Keyset (cursor) pagination for the list pages.
+
+Pages are addressed by the sort key and id of the last row shown instead of
+an OFFSET, so fetching page 500 costs the same index range scan as page 1.
+"""
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, request, url_for
+from sqlalchemy import and_, or_
+
+
+class Page:
+    def __init__(self, items, per_page, next_cursor=None, cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    def url(self, cursor=None):
+        """URL of this list with the current filters and the given cursor."""
+        args = request.args.to_dict()
+        args.pop("cursor", None)
+        if cursor:
+            args["cursor"] = cursor
+        return url_for(request.endpoint, **request.view_args, **args)
+
+    @property
+    def next_url(self):
+        return self.url(self.next_cursor) if self.has_next else None
+
+    @property
+    def first_url(self):
+        return self.url()
+
+
+def encode_cursor(value, id):
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps([value, id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (sort_value, id) from a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, id = json.loads(raw)
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+        return value, int(id)
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def page_size():
+    """Requested page size from ?per_page=, clamped to LIST_MAX_PAGE_SIZE."""
+    default = current_app.config.get("LIST_PAGE_SIZE", 25)
+    maximum = current_app.config.get("LIST_MAX_PAGE_SIZE", 100)
+    per_page = request.args.get("per_page", type=int) or default
+    return max(1, min(per_page, maximum))
+
+
+def keyset_query(query, sort_col, id_col, descending=True, key=None, per_page=25):
+    """The query keyset_paginate() runs: rows after key (sort_value, id), ordered, one past per_page."""
+    if key is not None:
+        value, last_id = key
+        if descending:
+            query = query.filter(or_(sort_col < value, and_(sort_col == value, id_col < last_id)))
+        else:
+            query = query.filter(or_(sort_col > value, and_(sort_col == value, id_col > last_id)))
+
+    if descending:
+        query = query.order_by(sort_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(sort_col.asc(), id_col.asc())
+    return query.limit(per_page + 1)
+
+
+def keyset_paginate(query, sort_col, id_col, descending=True, cursor=None, per_page=None):
+    """Return one Page of query ordered by (sort_col, id_col).
+
+    cursor and per_page default to the ?cursor= and ?per_page= request args.
+    """
+    if cursor is None:
+        cursor = request.args.get("cursor")
+    if per_page is None:
+        per_page = page_size()
+
+    key = decode_cursor(cursor)
+    rows = keyset_query(query, sort_col, id_col, descending, key, per_page).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_col.key), getattr(last, id_col.key))
+    return Page(rows, per_page, next_cursor, cursor if key is not None else None)
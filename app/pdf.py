@@ -0,0 +1,372 @@
+"""Invoice PDF rendering, PDF storage and batch export.
+
+Rendering works on a plain-dict snapshot of the invoice so the same layout
+code can run outside a request, a database session or the current process.
+PDFs are rendered into memory and stored under a hash of that snapshot plus
+TEMPLATE_VERSION, so they are reused until the invoice (or the layout)
+changes. Storage is in-process by default, or on disk when configured.
+
+ReportLab, the font, the stylesheet and the table style are set up once per
+process on first use (warm_up()), not on every render. With PDF_WARM_UP set
+this happens at startup instead, so a gunicorn --preload master does it once
+for all of its workers.
+"""
+import glob
+import hashlib
+import heapq
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time
+
+from sqlalchemy.orm import selectinload
+
+# bump whenever the layout below changes so cached PDFs are regenerated
+TEMPLATE_VERSION = "1"
+
+FONT_NAME = "HeiseiMin-W3"
+_stack = None
+_stack_lock = threading.Lock()
+
+
+def invoice_snapshot(invoice):
+    """Everything the PDF shows, as JSON-serializable data."""
+    return {
+        "id": invoice.id,
+        "client_name": invoice.client_name,
+        "created_at": invoice.created_at.strftime("%Y-%m-%d"),
+        "tax_percent": invoice.tax_percent or 0,
+        "subtotal": invoice.subtotal or 0,
+        "tax_amount": invoice.tax_amount,
+        "total": invoice.total or 0,
+        "items": [
+            {"name": i.name, "qty": i.qty, "price": i.price, "line_total": i.line_total}
+            for i in invoice.items
+        ],
+    }
+
+
+def fingerprint(snapshot):
+    payload = json.dumps([TEMPLATE_VERSION, snapshot], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Stack:
+    """The ReportLab pieces every render uses; build with warm_up()."""
+
+    def __init__(self):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib import colors
+        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+        from reportlab.pdfbase import pdfmetrics
+
+        # Register Unicode font (₹ symbol)
+        pdfmetrics.registerFont(UnicodeCIDFont(FONT_NAME))
+
+        self.A4 = A4
+        self.SimpleDocTemplate = SimpleDocTemplate
+        self.Table = Table
+        self.Paragraph = Paragraph
+        self.Spacer = Spacer
+        self.styles = getSampleStyleSheet()
+        self.table_style = TableStyle([
+            # Header
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1976D2")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+
+            # Body font
+            ('FONTNAME', (0, 0), (-1, -1), FONT_NAME),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+
+            # Grid
+            ('GRID', (0, 0), (-1, -1), 0.7, colors.grey),
+
+            # Alignments
+            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+            ('ALIGN', (2, 1), (4, -1), 'CENTER'),
+
+            # Highlight totals
+            ('BACKGROUND', (0, -3), (-1, -1), colors.HexColor("#E3F2FD")),
+        ])
+
+
+def warm_up():
+    """Import ReportLab and build the font, stylesheet and table style, once per process."""
+    global _stack
+    if _stack is None:
+        with _stack_lock:
+            if _stack is None:
+                _stack = _Stack()
+    return _stack
+
+
+def render_invoice_pdf(snapshot, target):
+    """Render an invoice snapshot into target (a file path or binary file object)."""
+    rl = warm_up()
+    Paragraph, Spacer = rl.Paragraph, rl.Spacer
+
+    # PDF Document setup
+    doc = rl.SimpleDocTemplate(
+        target,
+        pagesize=rl.A4,
+        rightMargin=40, leftMargin=40,
+        topMargin=30, bottomMargin=30
+    )
+
+    styles = rl.styles
+    story = []
+
+    # ---------------- Title ----------------
+    story.append(Paragraph(
+        f"<para align='center'><font size=22><b>INVOICE</b></font></para>",
+        styles["Title"]
+    ))
+
+    story.append(Spacer(1, 10))
+
+    # ---------------- Client + Date ----------------
+    story.append(Paragraph(
+        f"<para align='center'><font size=12>Date: {snapshot['created_at']}</font></para>",
+        styles["Normal"]
+    ))
+    story.append(Paragraph(
+        f"<para align='center'><font size=12>Client: <b>{snapshot['client_name']}</b></font></para>",
+        styles["Normal"]
+    ))
+
+    story.append(Spacer(1, 20))
+
+    # ---------------- Table Data ----------------
+    data = [["#", "Item", "Qty", "Price", "Total"]]
+
+    for idx, item in enumerate(snapshot["items"], start=1):
+        data.append([
+            idx,
+            item["name"],
+            item["qty"],
+            f"₹{item['price']:.2f}",
+            f"₹{item['line_total']:.2f}"
+        ])
+
+    # ---------------- Summary rows ----------------
+    data.append(["", "", "", "Subtotal", f"₹{snapshot['subtotal']:.2f}"])
+    data.append(["", "", "", f"Tax ({snapshot['tax_percent']}%)", f"₹{snapshot['tax_amount']:.2f}"])
+    data.append(["", "", "", "<b>Grand Total</b>", f"<b>₹{snapshot['total']:.2f}</b>"])
+
+    # ---------------- Table Style ----------------
+    table = rl.Table(data, colWidths=[35, 220, 55, 90, 90])
+    table.setStyle(rl.table_style)
+
+    story.append(table)
+    story.append(Spacer(1, 25))
+
+    # ---------------- Footer ----------------
+    story.append(Paragraph(
+        "<para align='center'><font size=11>Thank you for doing business with us!</font></para>",
+        styles["Normal"]
+    ))
+
+    doc.build(story)
+
+
+def render_to_bytes(snapshot):
+    buf = io.BytesIO()
+    render_invoice_pdf(snapshot, buf)
+    return buf.getvalue()
+
+
+def iter_invoice_snapshots(start, end, batch_size=200):
+    """Snapshots of invoices created between two dates (inclusive), oldest first.
+
+    Archived invoices are included: both tables are read in order and merged.
+    """
+    from .models import Invoice, InvoiceArchive
+    streams = [
+        model.query
+        .options(selectinload(model.items))
+        .filter(model.created_at >= datetime.combine(start, time.min),
+                model.created_at <= datetime.combine(end, time.max))
+        .order_by(model.created_at, model.id)
+        .yield_per(batch_size)
+        for model in (Invoice, InvoiceArchive)
+    ]
+    for invoice in heapq.merge(*streams, key=lambda inv: (inv.created_at, inv.id)):
+        yield invoice_snapshot(invoice)
+
+
+def render_many(snapshots, workers=None, window=None):
+    """Yield (snapshot, pdf_bytes) in input order, rendering in a process pool.
+
+    At most `window` PDFs are queued or held in memory at once. workers=0
+    renders in the calling process.
+    """
+    if workers == 0:
+        for snapshot in snapshots:
+            yield snapshot, render_to_bytes(snapshot)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    window = window or 2 * workers
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+    pending = deque()
+    try:
+        for snapshot in snapshots:
+            pending.append((snapshot, pool.submit(render_to_bytes, snapshot)))
+            if len(pending) >= window:
+                done, future = pending.popleft()
+                yield done, future.result()
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
+    finally:
+        # also reached when the consumer stops early, e.g. a client disconnect
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable write target that hands written bytes back to iter_zip."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_zip(files):
+    """Stream a ZIP archive of (name, bytes) pairs one member at a time."""
+    sink = _ZipSink()
+    # PDFs are already compressed, deflating them again only costs CPU
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, data in files:
+            zf.writestr(name, data)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_invoices_zip(start, end, workers=None):
+    """Byte chunks of a ZIP holding every invoice PDF in the date range."""
+    rendered = render_many(iter_invoice_snapshots(start, end), workers=workers)
+    return iter_zip(
+        (f"invoice_{s['id']}_{s['created_at']}.pdf", data) for s, data in rendered
+    )
+
+
+class PdfStorage:
+    """Where rendered PDFs are kept, keyed by invoice id and fingerprint."""
+
+    def open(self, invoice_id, digest):
+        """Return a readable binary file for the stored PDF, or None."""
+        raise NotImplementedError
+
+    def put(self, invoice_id, digest, data):
+        raise NotImplementedError
+
+    def modified(self, invoice_id, digest):
+        """When the stored PDF was rendered (a Unix timestamp), or None if it is not stored."""
+        raise NotImplementedError
+
+
+class MemoryStorage(PdfStorage):
+    """Keep the most recently rendered PDFs in process memory."""
+
+    def __init__(self, maxsize=64):
+        from .cache import LRUCache
+        self._cache = LRUCache(maxsize=maxsize, ttl=0)
+
+    def open(self, invoice_id, digest):
+        entry = self._cache.get((invoice_id, digest))
+        return io.BytesIO(entry[0]) if entry is not None else None
+
+    def put(self, invoice_id, digest, data):
+        self._cache.set((invoice_id, digest), (data, datetime.now().timestamp()))
+
+    def modified(self, invoice_id, digest):
+        entry = self._cache.get((invoice_id, digest))
+        return entry[1] if entry is not None else None
+
+
+class FileStorage(PdfStorage):
+    """Directory of rendered invoices named invoice_<id>_<fingerprint>.pdf.
+
+    Files are written to a temporary name and renamed into place, so readers
+    never see a partial PDF and concurrent renders of one invoice are harmless.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path_for(self, invoice_id, digest):
+        return os.path.join(self.directory, f"invoice_{invoice_id}_{digest[:16]}.pdf")
+
+    def open(self, invoice_id, digest):
+        try:
+            return open(self.path_for(invoice_id, digest), "rb")
+        except FileNotFoundError:
+            return None
+
+    def modified(self, invoice_id, digest):
+        try:
+            return os.path.getmtime(self.path_for(invoice_id, digest))
+        except FileNotFoundError:
+            return None
+
+    def put(self, invoice_id, digest, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(invoice_id, digest)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._prune(invoice_id, keep=path)
+
+    def _prune(self, invoice_id, keep):
+        # drop PDFs rendered from older versions of this invoice
+        for old in glob.glob(os.path.join(self.directory, f"invoice_{invoice_id}_*.pdf")):
+            if old != keep:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+
+def init_app(app):
+    if app.config.get("PDF_WARM_UP"):
+        warm_up()
+    if app.config.get("INVOICE_PDF_STORAGE") == "file":
+        directory = app.config.get("INVOICE_PDF_DIR") or os.path.join(app.static_folder, "invoices")
+        storage = FileStorage(directory)
+    else:
+        storage = MemoryStorage(app.config.get("INVOICE_PDF_CACHE_SIZE", 64))
+    app.extensions["pdf_storage"] = storage
+
+
+def get_or_render(storage, snapshot, digest):
+    """Return a binary file with the invoice PDF, rendering and storing it on a miss."""
+    fh = storage.open(snapshot["id"], digest)
+    if fh is None:
+        data = render_to_bytes(snapshot)
+        storage.put(snapshot["id"], digest, data)
+        fh = io.BytesIO(data)
+    return fh
@@ -0,0 +1,233 @@
+"""Follow-up reminders (`flask reminders`, the Procfile "reminders" process).
+
+The scheduler keeps a min-heap of (followup_datetime, id) for the pending,
+not yet reminded follow-ups falling due within a lookahead window. Each
+tick it only reads what is new since the last one: the slice of time that
+entered the window, plus follow-ups created since the highest id it has
+seen, plus follow-ups rescheduled (rescheduled_at) since the last tick. All
+three reads are index range scans that fetch just those two columns. A
+heap entry whose follow-up was rescheduled since is skipped when popped.
+The whole window is still reloaded every REMINDER_RESYNC seconds as a
+safety net.
+
+Due entries are popped in batches. Each batch is claimed with one
+conditional UPDATE ... RETURNING that sets reminded_at, so a follow-up
+completed since it was queued, or reminded by another scheduler, is skipped.
+The claimed follow-ups are then handed to the configured notifier. If the
+notifier fails, the claim is released and the batch is retried on the next
+tick.
+"""
+import heapq
+import json
+import logging
+import os
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, update
+
+from . import db
+from .models import FollowUp, User
+
+logger = logging.getLogger("app.reminders")
+
+
+# ---------------- Notifiers ----------------
+
+class Notifier:
+    """Delivers reminders: a list of dicts with id, client_name, client_phone,
+    due (ISO date-time), note, user_id, username and overdue."""
+
+    def send(self, reminders):
+        raise NotImplementedError
+
+
+class LogNotifier(Notifier):
+    def send(self, reminders):
+        for r in reminders:
+            logger.info("%s follow-up #%s with %s (%s) at %s for %s",
+                        "Overdue" if r["overdue"] else "Due", r["id"], r["client_name"],
+                        r["client_phone"], r["due"], r["username"] or "unassigned")
+
+
+class FileNotifier(Notifier):
+    """Append reminders as JSON lines, e.g. for local testing."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, reminders):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            for r in reminders:
+                fh.write(json.dumps(r) + "\n")
+
+
+class WebhookNotifier(Notifier):
+    """POST each batch as {"reminders": [...]} to a URL (chat bot, SMS gateway, ...)."""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, reminders):
+        body = json.dumps({"reminders": reminders}).encode()
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+
+def notifier_from_config(config, instance_path):
+    kind = config.get("REMINDER_NOTIFIER", "log")
+    if kind == "file":
+        return FileNotifier(config.get("REMINDER_FILE") or os.path.join(instance_path, "reminders.jsonl"))
+    if kind == "webhook":
+        if not config.get("REMINDER_WEBHOOK_URL"):
+            raise ValueError("REMINDER_NOTIFIER=webhook needs REMINDER_WEBHOOK_URL")
+        return WebhookNotifier(config["REMINDER_WEBHOOK_URL"])
+    if kind != "log":
+        raise ValueError(f"Unknown REMINDER_NOTIFIER: {kind}")
+    return LogNotifier()
+
+
+# a rescheduled follow-up needs a new reminder
+@event.listens_for(FollowUp.followup_datetime, "set")
+def _rescheduled(target, value, oldvalue, initiator):
+    if oldvalue != value and target.id is not None:
+        target.reminded_at = None
+        target.rescheduled_at = datetime.now()
+
+
+# ---------------- Scheduler ----------------
+
+# rescheduled_at comes from the web processes' clocks and is committed a
+# moment after it is set, so each tick rereads this much before the last one
+RESCHEDULE_OVERLAP = timedelta(minutes=1)
+
+class Scheduler:
+    def __init__(self, notifier, lead=timedelta(minutes=15), lookahead=timedelta(hours=1),
+                 batch_size=500, resync=600):
+        self.notifier = notifier
+        self.lead = lead            # remind this long before the follow-up is due
+        self.lookahead = lookahead  # how far past "due now" the heap is filled
+        self.batch_size = batch_size
+        self.resync = resync
+        self.heap = []
+        self.queued = {}            # id -> due of its live heap entry
+        self.loaded_until = None
+        self.last_id = 0
+        self.last_resync = None
+        self.last_refresh = None    # wall clock time of the last read, for rescheduled_at
+
+    def _pending(self):
+        return (db.session.query(FollowUp.followup_datetime, FollowUp.id)
+                .filter(FollowUp.status == "pending", FollowUp.reminded_at.is_(None)))
+
+    def _push(self, rows):
+        for due, id in rows:
+            if self.queued.get(id) != due:
+                # an older entry for a rescheduled id stays in the heap and is skipped when popped
+                heapq.heappush(self.heap, (due, id))
+                self.queued[id] = due
+
+    def refresh(self, now):
+        """Bring the heap up to date for the window ending at now + lead + lookahead."""
+        horizon = now + self.lead + self.lookahead
+        max_id = db.session.query(func.max(FollowUp.id)).scalar() or 0
+        refreshed = datetime.now()
+        if self.loaded_until is None or time.monotonic() - self.last_resync >= self.resync:
+            self.heap, self.queued = [], {}
+            self._push(self._pending().filter(FollowUp.followup_datetime <= horizon))
+            self.last_resync = time.monotonic()
+        else:
+            # the slice of time that entered the window since the last tick
+            self._push(self._pending().filter(FollowUp.followup_datetime > self.loaded_until,
+                                              FollowUp.followup_datetime <= horizon))
+            # follow-ups created since then that were already inside the window
+            if max_id > self.last_id:
+                self._push(self._pending().filter(FollowUp.id > self.last_id,
+                                                  FollowUp.followup_datetime <= self.loaded_until))
+            # follow-ups moved into the window since then
+            self._push(self._pending().filter(FollowUp.rescheduled_at >= self.last_refresh - RESCHEDULE_OVERLAP,
+                                              FollowUp.followup_datetime <= self.loaded_until))
+        self.loaded_until = horizon
+        self.last_id = max_id
+        self.last_refresh = refreshed
+        db.session.rollback()  # end the read transaction between ticks
+
+    def _claim(self, ids, now):
+        stmt = (update(FollowUp)
+                .where(FollowUp.id.in_(ids), FollowUp.status == "pending", FollowUp.reminded_at.is_(None),
+                       FollowUp.followup_datetime <= now + self.lead)  # not rescheduled since
+                .values(reminded_at=now)
+                .returning(FollowUp.id, FollowUp.client_name, FollowUp.client_phone,
+                           FollowUp.followup_datetime, FollowUp.note, FollowUp.user_id)
+                .execution_options(synchronize_session=False))
+        rows = db.session.execute(stmt).all()
+        db.session.commit()
+        return rows
+
+    def _release(self, ids):
+        (FollowUp.query.filter(FollowUp.id.in_(ids))
+         .update({"reminded_at": None}, synchronize_session=False))
+        db.session.commit()
+
+    def tick(self, now=None):
+        """Send every reminder that is due; returns how many were sent."""
+        now = now or datetime.now()
+        self.refresh(now)
+        usernames = None
+        sent = 0
+        while self.heap and self.heap[0][0] <= now + self.lead:
+            batch = []
+            while self.heap and self.heap[0][0] <= now + self.lead and len(batch) < self.batch_size:
+                due, id = heapq.heappop(self.heap)
+                if self.queued.get(id) != due:
+                    continue  # superseded by a reschedule
+                del self.queued[id]
+                batch.append((due, id))
+            rows = self._claim([id for _, id in batch], now)
+            if not rows:
+                continue  # completed or reminded elsewhere since they were queued
+            if usernames is None:
+                usernames = dict(db.session.query(User.id, User.username))
+            reminders = [{
+                "id": r.id,
+                "client_name": r.client_name,
+                "client_phone": r.client_phone,
+                "due": r.followup_datetime.isoformat(),
+                "note": r.note,
+                "user_id": r.user_id,
+                "username": usernames.get(r.user_id),
+                "overdue": r.followup_datetime < now,
+            } for r in rows]
+            try:
+                self.notifier.send(reminders)
+            except Exception:
+                logger.exception("notifier failed; %d reminders will be retried", len(reminders))
+                self._release([r.id for r in rows])
+                self._push((r.followup_datetime, r.id) for r in rows)
+                break
+            sent += len(reminders)
+        return sent
+
+
+def run(app, once=False):
+    """Tick every REMINDER_INTERVAL seconds until interrupted (or once)."""
+    config = app.config
+    with app.app_context():
+        scheduler = Scheduler(
+            notifier_from_config(config, app.instance_path),
+            lead=timedelta(minutes=config.get("REMINDER_LEAD_MINUTES", 15)),
+            lookahead=timedelta(seconds=config.get("REMINDER_LOOKAHEAD", 3600)),
+            batch_size=config.get("REMINDER_BATCH_SIZE", 500),
+            resync=config.get("REMINDER_RESYNC", 600),
+        )
+        while True:
+            sent = scheduler.tick()
+            if sent:
+                app.logger.info("sent %d follow-up reminders", sent)
+            if once:
+                return sent
+            time.sleep(config.get("REMINDER_INTERVAL", 30))
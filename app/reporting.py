@@ -0,0 +1,141 @@
+"""SQL-side aggregation for the dashboard and reports pages.
+
+Every helper here returns small, fixed-size results (counts, sums, one row
+per month) so memory use does not depend on table size. Follow-up and sales
+figures are read from the daily rollup tables (see app/rollups.py), so they
+cost one row per day in range however many invoices and follow-ups exist.
+Month bucketing uses EXTRACT, which SQLAlchemy compiles for SQLite, Postgres
+and MySQL alike.
+"""
+from datetime import date, datetime, time
+
+from sqlalchemy import func, extract, select
+
+from . import db
+from .models import Client, Quotation, SalesRollup, FollowUpRollup
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD query argument, returning None when missing or invalid."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def parse_year(value):
+    """Parse a ?year= query argument, falling back to the current year.
+
+    Years outside 1..9998 fall back too: the year after must still be a valid date.
+    """
+    try:
+        year = int(value)
+    except (TypeError, ValueError):
+        year = 0
+    return year if 1 <= year <= 9998 else datetime.now().year
+
+
+def date_filters(column, year=None, start=None, end=None):
+    """Build WHERE clauses restricting column to a year and/or an inclusive date range."""
+    clauses = []
+    if year:
+        clauses.append(column >= datetime(year, 1, 1))
+        clauses.append(column < datetime(year + 1, 1, 1))
+    if start:
+        clauses.append(column >= datetime.combine(start, time.min))
+    if end:
+        clauses.append(column <= datetime.combine(end, time.max))
+    return clauses
+
+
+def day_filters(column, year=None, start=None, end=None):
+    """date_filters() for a DATE column, such as the rollups' day."""
+    clauses = []
+    if year:
+        clauses.append(column >= date(year, 1, 1))
+        clauses.append(column < date(year + 1, 1, 1))
+    if start:
+        clauses.append(column >= start)
+    if end:
+        clauses.append(column <= end)
+    return clauses
+
+
+def entity_totals():
+    """Counts of clients, follow-ups, quotations and invoices in one round-trip."""
+    row = db.session.execute(select(
+        select(func.count(Client.id)).scalar_subquery().label("clients"),
+        select(func.coalesce(func.sum(FollowUpRollup.count), 0)).scalar_subquery().label("followups"),
+        select(func.count(Quotation.id)).scalar_subquery().label("quotations"),
+        select(func.coalesce(func.sum(SalesRollup.invoices), 0)).scalar_subquery().label("invoices"),
+    )).one()
+    return {name: int(value) for name, value in row._mapping.items()}
+
+
+# monthly series -> (rollup column summed, its day column)
+MONTHLY = {
+    "followups": (FollowUpRollup.count, FollowUpRollup.day),
+    "invoices": (SalesRollup.invoices, SalesRollup.day),
+    "sales": (SalesRollup.total, SalesRollup.day),
+}
+
+
+def monthly_query(series, year, start=None, end=None):
+    """(month, sum) rows of a MONTHLY series for the given year."""
+    value, day = MONTHLY[series]
+    month_col = extract("month", day)
+    return (db.session.query(month_col, func.sum(value))
+            .filter(*day_filters(day, year, start, end))
+            .group_by(month_col))
+
+
+def _monthly(series, year, start=None, end=None):
+    """A MONTHLY series for the given year as a zero-filled 12-item list."""
+    result = [0] * 12
+    for m, v in monthly_query(series, year, start, end):
+        result[int(m) - 1] = v or 0
+    return result
+
+
+def monthly_followups(year, start=None, end=None):
+    return [int(v) for v in _monthly("followups", year, start, end)]
+
+
+def monthly_invoices(year, start=None, end=None):
+    return [int(v) for v in _monthly("invoices", year, start, end)]
+
+
+def monthly_sales(year, start=None, end=None):
+    return [float(v) for v in _monthly("sales", year, start, end)]
+
+
+def total_sales(year=None, start=None, end=None):
+    return float(db.session.query(func.coalesce(func.sum(SalesRollup.total), 0))
+                 .filter(*day_filters(SalesRollup.day, year, start, end))
+                 .scalar())
+
+
+def status_counts_query(year=None, start=None, end=None):
+    return (db.session.query(FollowUpRollup.status, func.sum(FollowUpRollup.count))
+            .filter(*day_filters(FollowUpRollup.day, year, start, end))
+            .group_by(FollowUpRollup.status))
+
+
+def followup_status_counts(year=None, start=None, end=None):
+    """Follow-up counts keyed by status ("pending", "completed", ...)."""
+    return {s: int(c) for s, c in status_counts_query(year, start, end) if c}
+
+
+def available_years():
+    """Years spanned by invoices and follow-ups, newest first, always including this year."""
+    years = {date.today().year}
+    for column in (SalesRollup.day, FollowUpRollup.day):
+        first, last = db.session.query(func.min(column), func.max(column)).one()
+        if first and last:
+            years.update(range(first.year, last.year + 1))
+    return sorted(years, reverse=True)
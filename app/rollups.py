@@ -0,0 +1,215 @@
+"""Daily rollups behind the dashboard and reports (`flask rollups-rebuild`).
+
+sales_rollup holds the invoice count and sales total per day, and
+follow_up_rollup the follow-up count per day, owner and status. Report
+queries read these tables, so their cost grows with the number of days shown
+rather than the number of rows.
+
+The rollups are kept current in the same transaction as the write: ORM
+flushes of Invoice and FollowUp add or move their contribution (old values
+come from attribute history), and the bulk paths that bypass the ORM —
+bulk_update_followups() and imports via add_followups() — do it themselves.
+Deltas are applied with INSERT ... ON CONFLICT DO UPDATE, so concurrent
+writers never overwrite each other's counts. rebuild() recomputes both
+tables from scratch, e.g. after editing rows by hand. Archiving (app/archive.py)
+moves rows without touching the rollups, and rebuild() counts the archive
+tables too, so reports keep the full history.
+"""
+from collections import defaultdict
+
+from sqlalchemy import Date, delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session, attributes
+
+from . import db
+from .models import FollowUp, Invoice, FollowUpArchive, InvoiceArchive, SalesRollup, FollowUpRollup
+
+_sales = SalesRollup.__table__
+_followups = FollowUpRollup.__table__
+
+
+def _day(column):
+    return func.date(column, type_=Date)
+
+
+def _followup_key(when, user_id, status):
+    return (when.date(), user_id or 0, status or "pending")
+
+
+class Deltas:
+    def __init__(self):
+        self.sales = defaultdict(lambda: [0, 0.0])  # day -> [invoices, total]
+        self.followups = defaultdict(int)           # (day, user_id, status) -> count
+
+    def invoice(self, created_at, total, sign):
+        if created_at is not None:
+            entry = self.sales[created_at.date()]
+            entry[0] += sign
+            entry[1] += sign * (total or 0)
+
+    def followup(self, when, user_id, status, sign):
+        if when is not None:
+            self.followups[_followup_key(when, user_id, status)] += sign
+
+    def apply(self, conn):
+        sales = [{"day": day, "invoices": n, "total": total}
+                 for day, (n, total) in self.sales.items() if n or total]
+        followups = [{"day": day, "user_id": user_id, "status": status, "count": n}
+                     for (day, user_id, status), n in self.followups.items() if n]
+        if sales:
+            _add(conn, _sales, ["day"], ["invoices", "total"], sales)
+        if followups:
+            _add(conn, _followups, ["day", "user_id", "status"], ["count"], followups)
+
+
+def _add(conn, table, keys, counters, rows):
+    """Add rows' counters to the existing rollup rows, creating missing ones."""
+    dialect = conn.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys, set_={c: table.c[c] + stmt.excluded[c] for c in counters})
+        conn.execute(stmt, rows)
+        return
+    for row in rows:
+        match = [table.c[k] == row[k] for k in keys]
+        result = conn.execute(update(table).where(*match).values({c: table.c[c] + row[c] for c in counters}))
+        if not result.rowcount:
+            conn.execute(insert(table).values(row))
+
+
+# ---------------- ORM writes ----------------
+
+# rollup keys: old values must be in the attribute history even when the
+# attribute was expired before being set
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+for _attr in (FollowUp.followup_datetime, FollowUp.user_id, FollowUp.status, Invoice.created_at, Invoice.total):
+    event.listen(_attr, "set", _load_old_value, active_history=True)
+
+
+def _old(obj, key):
+    history = attributes.get_history(obj, key)
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(obj, key)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changes(session, flush_context, instances):
+    # changed and deleted rows are read before the flush, while the old row still exists
+    deltas = Deltas()
+    for obj in session.dirty:
+        if isinstance(obj, FollowUp):
+            old = (_old(obj, "followup_datetime"), _old(obj, "user_id"), _old(obj, "status"))
+            new = (obj.followup_datetime, obj.user_id, obj.status)
+            if old != new:
+                deltas.followup(*old, -1)
+                deltas.followup(*new, 1)
+        elif isinstance(obj, Invoice):
+            old = (_old(obj, "created_at"), _old(obj, "total"))
+            new = (obj.created_at, obj.total)
+            if old != new:
+                deltas.invoice(*old, -1)
+                deltas.invoice(*new, 1)
+    for obj in session.deleted:
+        if isinstance(obj, FollowUp):
+            deltas.followup(_old(obj, "followup_datetime"), _old(obj, "user_id"), _old(obj, "status"), -1)
+        elif isinstance(obj, Invoice):
+            deltas.invoice(_old(obj, "created_at"), _old(obj, "total"), -1)
+    session.info["rollup_deltas"] = deltas
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_changes(session, flush_context):
+    # new rows are counted after the flush, once column defaults are filled in
+    deltas = session.info.pop("rollup_deltas", None) or Deltas()
+    for obj in session.new:
+        if isinstance(obj, FollowUp):
+            deltas.followup(obj.followup_datetime, obj.user_id, obj.status, 1)
+        elif isinstance(obj, Invoice):
+            deltas.invoice(obj.created_at, obj.total, 1)
+    if deltas.sales or deltas.followups:
+        deltas.apply(session.connection())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("rollup_deltas", None)
+
+
+# ---------------- Bulk writes ----------------
+
+def add_followups(rows):
+    """Count follow-ups inserted with a Core insert (dicts of column values)."""
+    deltas = Deltas()
+    for row in rows:
+        deltas.followup(row["followup_datetime"], row.get("user_id"), row.get("status"), 1)
+    deltas.apply(db.session.connection())
+
+
+def bulk_update_followups(query, values):
+    """query.update(values) on follow-ups in one UPDATE, moving their rollup counts along.
+
+    The affected rows are counted per rollup key first, with one GROUP BY over
+    the same selection. Returns the number of rows updated.
+    """
+    day = _day(FollowUp.followup_datetime)
+    groups = (query.with_entities(day, FollowUp.user_id, FollowUp.status, func.count())
+              .group_by(day, FollowUp.user_id, FollowUp.status)
+              .all())
+    count = query.update(values, synchronize_session=False)
+    deltas = Deltas()
+    for on, user_id, status, n in groups:
+        old = (on, user_id or 0, status or "pending")
+        new = (values["followup_datetime"].date() if "followup_datetime" in values else old[0],
+               values.get("user_id", user_id) or 0,
+               values.get("status", status) or "pending")
+        if old != new:
+            deltas.followups[old] -= n
+            deltas.followups[new] += n
+    deltas.apply(db.session.connection())
+    return count
+
+
+def _with_archive(model, archive_model, *names):
+    """model's columns, plus its archived rows once the archive table exists (migration 11)."""
+    query = select(*(getattr(model, n) for n in names))
+    if inspect(db.engine).has_table(archive_model.__tablename__):
+        query = query.union_all(select(*(getattr(archive_model, n) for n in names)))
+    return query.subquery()
+
+
+def rebuild():
+    """Recompute both rollup tables from all invoices and follow-ups, archived ones included.
+
+    Returns the row count of each table.
+    """
+    db.session.execute(delete(SalesRollup))
+    db.session.execute(delete(FollowUpRollup))
+    invoices = _with_archive(Invoice, InvoiceArchive, "created_at", "total")
+    day = _day(invoices.c.created_at)
+    db.session.execute(insert(SalesRollup).from_select(
+        ["day", "invoices", "total"],
+        select(day, func.count(), func.coalesce(func.sum(invoices.c.total), 0.0))
+        .where(invoices.c.created_at.is_not(None))
+        .group_by(day)))
+    followups = _with_archive(FollowUp, FollowUpArchive, "followup_datetime", "user_id", "status")
+    day = _day(followups.c.followup_datetime)
+    user_id = func.coalesce(followups.c.user_id, 0)
+    status = func.coalesce(followups.c.status, "pending")
+    db.session.execute(insert(FollowUpRollup).from_select(
+        ["day", "user_id", "status", "count"],
+        select(day, user_id, status, func.count())
+        .where(followups.c.followup_datetime.is_not(None))
+        .group_by(day, user_id, status)))
+    db.session.commit()
+    return {
+        "sales_rollup": db.session.query(func.count()).select_from(SalesRollup).scalar(),
+        "follow_up_rollup": db.session.query(func.count()).select_from(FollowUpRollup).scalar(),
+    }
@@ -1,16 +1,20 @@
-from flask import render_template, redirect, url_for, flash, request, current_app, send_file, jsonify
+from flask import render_template, redirect, url_for, flash, request, current_app, send_file, jsonify, stream_with_context, abort
 from flask_login import login_user, logout_user, login_required, current_user
 from . import db
-from .models import User, RoleEnum, FollowUp, Product, Quotation, Invoice, Client
-from .forms import LoginForm, UserCreateForm, FollowUpForm, ProductForm, QuotationForm, InvoiceForm
-from .utils import role_required
-import json, io
+from .models import (User, RoleEnum, FollowUp, Product, Quotation, Invoice, InvoiceItem, Client, Job, ImportRun,
+                     FollowUpArchive, InvoiceArchive)
+from .forms import LoginForm, UserCreateForm, FollowUpForm, FollowUpBulkForm, ProductForm, QuotationForm, InvoiceForm, ImportForm
+from .utils import role_required, has_role, normalize_phone
+from .database import replica_reads
+from . import reporting, rollups, pdf, jobs, importer, filters, export, search, clients, archive
+from .cache import summary_cache
+from .catalog import product_catalog
+from .pagination import keyset_paginate
 import os
 
 
 from flask import current_app as app
 from datetime import datetime
-from sqlalchemy import func, extract
 
 
 
@@ -30,51 +34,30 @@ def contact():
 
 @app.route('/')
 @login_required
+@replica_reads
 def dashboard():
-    # totals
-    total_clients = Client.query.count()
-    total_followups = FollowUp.query.count()
-    total_quotations = Quotation.query.count()
-    total_invoices = Invoice.query.count()
-
-    # helper: zero-filled 12-month list
-    months = list(range(1, 13))
-    followup_counts = [0] * 12
-    invoice_counts = [0] * 12
-
-    # follow-ups: group by month (works with SQLite and most DBs)
-    # extract month via strftime('%m', datetime)
-    followup_rows = db.session.query(
-        func.strftime('%m', FollowUp.followup_datetime).label('m'),
-        func.count(FollowUp.id)
-    ).group_by('m').all()
-
-    for m, cnt in followup_rows:
-        # m is '01'..'12' (string) in sqlite
-        idx = int(m) - 1
-        followup_counts[idx] = int(cnt)
-
-    # invoices: group by created_at month
-    invoice_rows = db.session.query(
-        func.strftime('%m', Invoice.created_at).label('m'),
-        func.count(Invoice.id)
-    ).group_by('m').all()
-
-    for m, cnt in invoice_rows:
-        idx = int(m) - 1
-        invoice_counts[idx] = int(cnt)
+    year = reporting.parse_year(request.args.get("year"))
+
+    # totals and zero-filled 12-month lists, cached until a tracked model is written
+    summary = summary_cache.get_or_compute("dashboard", year, lambda: {
+        "totals": reporting.entity_totals(),
+        "followup_counts": reporting.monthly_followups(year),
+        "invoice_counts": reporting.monthly_invoices(year),
+    })
+    totals = summary["totals"]
 
     # recent followups for display (limit 5)
     recent_followups = FollowUp.query.order_by(FollowUp.followup_datetime.desc()).limit(5).all()
 
     return render_template(
         "dashboard.html",
-        total_clients=total_clients,
-        total_followups=total_followups,
-        total_quotations=total_quotations,
-        total_invoices=total_invoices,
-        followup_counts=followup_counts,
-        invoice_counts=invoice_counts,
+        year=year,
+        total_clients=totals["clients"],
+        total_followups=totals["followups"],
+        total_quotations=totals["quotations"],
+        total_invoices=totals["invoices"],
+        followup_counts=summary["followup_counts"],
+        invoice_counts=summary["invoice_counts"],
         recent_followups=recent_followups
     )
 
@@ -122,6 +105,7 @@ def users():
 @app.route("/followups", methods=["GET", "POST"])
 @login_required
 @role_required("Sales", "Manager")
+@replica_reads
 def followups():
     form = FollowUpForm()
 
@@ -136,7 +120,8 @@ def followups():
             followup_datetime=followup_datetime,
             note=form.note.data,
             status="pending",
-            user_id=current_user.id
+            user_id=current_user.id,
+            client_id=clients.resolve(form.client_name.data, form.client_phone.data),
         )
 
         db.session.add(new_followup)
@@ -144,22 +129,110 @@ def followups():
         flash("Follow-up scheduled successfully!", "success")
         return redirect(url_for("followups"))
 
-    all_followups = FollowUp.query.order_by(FollowUp.followup_datetime.desc()).all()
-    return render_template("followups.html", form=form, followups=all_followups)
+    # ?archived=1 lists follow-ups moved to the archive instead
+    archived = bool(request.args.get("archived"))
+    page = keyset_paginate(*filters.listing("followups", request.args, archived))
+    all_users = User.query.order_by(User.username).all()
+    bulk_form = FollowUpBulkForm()
+    bulk_form.user_id.choices += [(u.id, u.username) for u in all_users]
+    if not has_role("Manager"):
+        bulk_form.action.choices = [c for c in bulk_form.action.choices if c[0] != "reassign"]
+    return render_template("followups.html", form=form, bulk_form=bulk_form, followups=page.items, page=page, users=all_users,
+                           archived=archived)
 
 
 @app.route("/followups/complete/<int:id>")
 @login_required
 def complete_followup(id):
     fu = FollowUp.query.get_or_404(id)
-    fu.status = "Completed"
+    fu.status = "completed"
     db.session.commit()
     flash("Follow-up marked completed", "success")
     return redirect(url_for("followups"))
 
+
+@app.route("/followups/bulk", methods=["POST"])
+@login_required
+@role_required("Sales", "Manager")
+def bulk_followups():
+    """Complete, reschedule or reassign the ticked follow-ups, or all that match the list filters.
+
+    Whatever the selection size this is one UPDATE statement; the filters
+    come from the list page's query string, exactly as the list applies them.
+    """
+    back = redirect(url_for("followups", **request.args))
+    form = FollowUpBulkForm()
+    form.user_id.choices += [(u.id, u.username) for u in User.query.order_by(User.username)]
+    if not form.validate_on_submit():
+        for errors in form.errors.values():
+            for error in errors:
+                flash(error, "danger")
+        return back
+    if form.action.data == "reassign" and not has_role("Manager"):
+        abort(403)
+
+    if form.scope.data == "filter":
+        query = filters.followups(request.args)
+    else:
+        ids = request.form.getlist("ids", type=int)
+        if not ids:
+            flash("Select at least one follow-up", "warning")
+            return back
+        query = FollowUp.query.filter(FollowUp.id.in_(ids))
+
+    if form.action.data == "complete":
+        query = query.filter(FollowUp.status != "completed")
+        values, done = {"status": "completed"}, "marked completed"
+    elif form.action.data == "reschedule":
+        when = datetime.combine(form.followup_date.data, form.followup_time.data)
+        # bulk updates skip ORM events, so do what reminders._rescheduled does here
+        values = {"followup_datetime": when, "reminded_at": None, "rescheduled_at": datetime.now()}
+        done = "rescheduled"
+    else:
+        values, done = {"user_id": form.user_id.data}, "reassigned"
+    count = rollups.bulk_update_followups(query, values)
+    db.session.commit()
+    flash(f"{count} follow-up{'s' if count != 1 else ''} {done}", "success")
+    return back
+
+# BULK IMPORT
+@app.route("/import", methods=["GET", "POST"])
+@login_required
+@role_required("Manager")
+def import_data():
+    form = ImportForm()
+    if form.validate_on_submit():
+        from werkzeug.utils import secure_filename
+        upload = form.file.data
+        path = os.path.join(importer.imports_dir(),
+                            f"{datetime.now():%Y%m%d%H%M%S}_{secure_filename(upload.filename)}")
+        upload.save(path)
+        run = importer.start_run(form.entity.data, path, user_id=current_user.id)
+        jobs.enqueue("import_file", user_id=current_user.id, run_id=run.id, path=path)
+        flash("Import queued; refresh this page to follow its progress.", "success")
+        return redirect(url_for("import_data"))
+    runs = ImportRun.query.order_by(ImportRun.id.desc()).limit(20).all()
+    return render_template("imports.html", form=form, runs=runs)
+
+
+@app.route("/import/<int:id>/errors")
+@login_required
+@role_required("Manager")
+def import_errors(id):
+    run = ImportRun.query.get_or_404(id)
+    path = importer.error_path(run)
+    if not os.path.exists(path):
+        if run.error_file:
+            # the worker wrote it: only visible here if IMPORT_DIR is shared storage
+            current_app.logger.error("import %s error report %s not found; IMPORT_DIR must be shared by web and "
+                                     "worker", run.id, path)
+        abort(404, "The error report is not available on this server.")
+    return send_file(path, mimetype="text/csv", as_attachment=True)
+
 # PRODUCTS
 @app.route("/products", methods=["GET","POST"])
 @login_required
+@replica_reads
 def products():
     form = ProductForm()
     if form.validate_on_submit():
@@ -168,28 +241,42 @@ def products():
         db.session.commit()
         flash("Product saved", "success")
         return redirect(url_for("products"))
-    prods = Product.query.order_by(Product.name).all()
-    return render_template("products.html", prods=prods, form=form)
+    page = keyset_paginate(*filters.listing("products", request.args))
+    prods = page.items
+    return render_template("products.html", prods=prods, page=page, form=form)
+
+@app.route("/products/lookup")
+@login_required
+def product_lookup():
+    """Typeahead for the quotation form: products whose name starts with ?q=."""
+    q = request.args.get("q", "")
+    limit = min(request.args.get("limit", 10, type=int), 50)
+    return jsonify(product_catalog.search(q, limit=limit) if q.strip() else [])
 
 # QUOTATIONS
 @app.route("/quotations", methods=["GET","POST"])
 @login_required
+@replica_reads
 def quotations():
     form = QuotationForm()
     if form.validate_on_submit():
+        # the quotation keeps its own copy, so later catalog price changes don't rewrite it
+        product = getattr(form, "product", None) or {}
         q = Quotation(
             client_name=form.client_name.data,
             client_phone=form.client_phone.data,
-            product_name=form.product_name.data,
-            product_details=form.product_details.data,
-            website_price=form.website_price.data
+            product_name=(form.product_name.data or "").strip() or product["name"],
+            product_details=form.product_details.data or product.get("details"),
+            website_price=form.website_price.data if form.website_price.data is not None else product.get("website_price", 0.0),
+            client_id=clients.resolve(form.client_name.data, form.client_phone.data),
+            product_id=product.get("id"),
         )
         db.session.add(q)
         db.session.commit()
         flash("Quotation created", "success")
         return redirect(url_for("quotations"))
-    quotes = Quotation.query.order_by(Quotation.created_at.desc()).all()
-    return render_template("quotations.html", quotes=quotes, form=form)
+    page = keyset_paginate(*filters.listing("quotations", request.args))
+    return render_template("quotations.html", quotes=page.items, page=page, form=form)
 
 
 @app.route("/quotations/share/<int:q_id>")
@@ -205,16 +292,7 @@ def share_quotation(q_id):
         f"Price: {q.website_price}"
     ]
     text = "%0A".join([line.replace('\n',' ') for line in msg_lines])
-    phone = q.client_phone.strip()
-    # Accept +91, +country or 10-digit local numbers
-    if phone.startswith("+"):
-        phone_sanitized = phone[1:].replace(" ", "")
-    else:
-        digits = "".join(ch for ch in phone if ch.isdigit())
-        if len(digits) == 10:
-            phone_sanitized = "91" + digits  # default country code, adjust if needed
-        else:
-            phone_sanitized = digits
+    phone_sanitized = normalize_phone(q.client_phone)
     wa_link = f"https://wa.me/{phone_sanitized}?text={text}"
     return redirect(wa_link)
 
@@ -222,203 +300,262 @@ def share_quotation(q_id):
 @app.route("/invoices", methods=["GET", "POST"])
 @login_required
 @role_required("Accountant", "Manager")
+@replica_reads
 def invoices():
     form = InvoiceForm()
     if form.validate_on_submit():
-        items = [
-            {
-                "name": form.item_name.data,
-                "qty": form.item_qty.data,
-                "price": form.item_price.data,
-                "total": form.item_qty.data * form.item_price.data,
-            }
-        ]
-        subtotal = sum(item["total"] for item in items)
-        tax_amount = subtotal * (form.tax_percent.data / 100)
-        grand_total = subtotal + tax_amount
-
         inv = Invoice(
             client_name=form.client_name.data,
-            items=json.dumps(items),
-            tax_percent=form.tax_percent.data,
-            subtotal=subtotal,
-            total=grand_total,
+            tax_percent=form.tax_percent.data or 0,
+            client_id=clients.resolve(form.client_name.data),
         )
+        inv.items.append(InvoiceItem(
+            name=form.item_name.data,
+            qty=form.item_qty.data,
+            price=form.item_price.data,
+        ))
+        inv.recalculate()
         db.session.add(inv)
         db.session.commit()
+        if current_app.config.get("INVOICE_PDF_STORAGE") == "file":
+            # shared storage: let the worker render it before anyone asks
+            jobs.enqueue("render_invoice_pdf", user_id=current_user.id, invoice_id=inv.id)
         flash("Invoice created successfully!", "success")
         return redirect(url_for("invoices"))
 
-    invoices = Invoice.query.order_by(Invoice.created_at.desc()).all()
-    return render_template("invoice.html", form=form, invoices=invoices)
+    archived = bool(request.args.get("archived"))
+    page = keyset_paginate(*filters.listing("invoices", request.args, archived))
+    return render_template("invoice.html", form=form, invoices=page.items, page=page, archived=archived)
 
 
 @app.route("/invoices/view/<int:id>")
 @login_required
+@replica_reads
 def invoice_view(id):
-    inv = Invoice.query.get_or_404(id)
-    items = json.loads(inv.items or "[]")
-    return render_template("invoice_view.html", inv=inv, items=items)
+    inv = archive.get_invoice(id)  # archived invoices stay viewable
+    if inv is None:
+        abort(404)
+    return render_template("invoice_view.html", inv=inv, items=inv.items)
 
 @app.route("/invoices/pdf/<int:id>")
 @login_required
+@replica_reads
 def invoice_pdf(id):
-    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.lib import colors
-    import os, json
-
-    invoice = Invoice.query.get_or_404(id)
-    items = json.loads(invoice.items or "[]")
-
-    # ---------------- Correct PDF path (NO double app/app) ----------------
-    folder_path = os.path.join(os.getcwd(), "app", "static", "invoices")
-    os.makedirs(folder_path, exist_ok=True)
-
-    pdf_path = os.path.join(folder_path, f"invoice_{invoice.id}.pdf")
-    # ---------------------------------------------------------------------
-
-    # Register Unicode font (₹ symbol)
-    pdfmetrics.registerFont(UnicodeCIDFont('HeiseiMin-W3'))
-
-    # PDF Document setup
-    doc = SimpleDocTemplate(
-        pdf_path, 
-        pagesize=A4,
-        rightMargin=40, leftMargin=40,
-        topMargin=30, bottomMargin=30
-    )
+    invoice = archive.get_invoice(id)
+    if invoice is None:
+        abort(404)
+    snapshot = pdf.invoice_snapshot(invoice)
+    digest = pdf.fingerprint(snapshot)
 
-    styles = getSampleStyleSheet()
-    story = []
+    # client already has this exact version
+    if digest in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(digest)
+        return response
 
-    # ---------------- Title ----------------
-    story.append(Paragraph(
-        f"<para align='center'><font size=22><b>INVOICE</b></font></para>",
-        styles["Title"]
-    ))
+    storage = current_app.extensions["pdf_storage"]
+    fh = pdf.get_or_render(storage, snapshot, digest)
+    last_modified = storage.modified(invoice.id, digest)
 
-    story.append(Spacer(1, 10))
+    return send_file(fh, mimetype="application/pdf", as_attachment=True,
+                     download_name=f"invoice_{invoice.id}.pdf", etag=digest, last_modified=last_modified)
 
-    # ---------------- Client + Date ----------------
-    story.append(Paragraph(
-        f"<para align='center'><font size=12>Date: {invoice.created_at.strftime('%Y-%m-%d')}</font></para>",
-        styles["Normal"]
-    ))
-    story.append(Paragraph(
-        f"<para align='center'><font size=12>Client: <b>{invoice.client_name}</b></font></para>",
-        styles["Normal"]
-    ))
 
-    story.append(Spacer(1, 20))
+@app.route("/invoices/export/pdf")
+@login_required
+@role_required("Accountant", "Manager")
+@replica_reads
+def export_invoice_pdfs():
+    # defaults to the current month
+    today = datetime.now().date()
+    start = reporting.parse_date(request.args.get("start")) or today.replace(day=1)
+    end = reporting.parse_date(request.args.get("end")) or today
 
-    # ---------------- Table Data ----------------
-    data = [["#", "Item", "Qty", "Price", "Total"]]
+    chunks = pdf.export_invoices_zip(start, end, workers=current_app.config.get("INVOICE_EXPORT_WORKERS"))
+    response = current_app.response_class(stream_with_context(chunks), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f"attachment; filename=invoices_{start}_{end}.zip"
+    return response
 
-    subtotal = 0
-    for idx, item in enumerate(items, start=1):
-        total = item["qty"] * item["price"]
-        subtotal += total
-        data.append([
-            idx,
-            item["name"],
-            item["qty"],
-            f"₹{item['price']:.2f}",
-            f"₹{total:.2f}"
-        ])
 
-    tax_amount = subtotal * (invoice.tax_percent / 100)
-    grand_total = subtotal + tax_amount
+@app.route("/invoices/export/pdf/async", methods=["POST"])
+@login_required
+@role_required("Accountant", "Manager")
+def export_invoice_pdfs_async():
+    today = datetime.now().date()
+    start = reporting.parse_date(request.values.get("start")) or today.replace(day=1)
+    end = reporting.parse_date(request.values.get("end")) or today
+    job = jobs.enqueue("export_invoice_pdfs", user_id=current_user.id, start=str(start), end=str(end))
+    return jsonify(job=job.to_dict(), status_url=url_for("job_status", id=job.id)), 202
+
+
+# BACKGROUND JOBS
+def _get_own_job(id):
+    job = Job.query.get_or_404(id)
+    if job.user_id != current_user.id and current_user.role != RoleEnum.Admin.value:
+        abort(404)
+    return job
 
-    # ---------------- Summary rows ----------------
-    data.append(["", "", "", "Subtotal", f"₹{subtotal:.2f}"])
-    data.append(["", "", "", f"Tax ({invoice.tax_percent}%)", f"₹{tax_amount:.2f}"])
-    data.append(["", "", "", "<b>Grand Total</b>", f"<b>₹{grand_total:.2f}</b>"])
 
-    # ---------------- Table Style ----------------
-    table = Table(data, colWidths=[35, 220, 55, 90, 90])
-    table.setStyle(TableStyle([
-        # Header
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1976D2")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+@app.route("/jobs/<int:id>")
+@login_required
+def job_status(id):
+    job = _get_own_job(id)
+    data = job.to_dict()
+    if job.status == "done" and job.result and "file" in data["result"]:
+        data["download_url"] = url_for("job_download", id=job.id)
+    return jsonify(data)
+
 
-        # Body font
-        ('FONTNAME', (0, 0), (-1, -1), 'HeiseiMin-W3'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
+@app.route("/jobs/<int:id>/download")
+@login_required
+def job_download(id):
+    job = _get_own_job(id)
+    result = job.to_dict()["result"] or {}
+    if job.status != "done" or "file" not in result:
+        abort(404)
+    path = os.path.join(jobs.results_dir(), result["file"])
+    if not os.path.exists(path):
+        # written by the worker: only visible here if JOB_RESULTS_DIR is shared storage
+        current_app.logger.error("job %s result %s not found; JOB_RESULTS_DIR must be shared by web and worker",
+                                 job.id, path)
+        abort(404, "The result file is not available on this server.")
+    return send_file(path, as_attachment=True)
 
-        # Grid
-        ('GRID', (0, 0), (-1, -1), 0.7, colors.grey),
 
-        # Alignments
-        ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-        ('ALIGN', (2, 1), (4, -1), 'CENTER'),
 
-        # Highlight totals
-        ('BACKGROUND', (0, -3), (-1, -1), colors.HexColor("#E3F2FD")),
-    ]))
 
-    story.append(table)
-    story.append(Spacer(1, 25))
 
-    # ---------------- Footer ----------------
-    story.append(Paragraph(
-        "<para align='center'><font size=11>Thank you for doing business with us!</font></para>",
-        styles["Normal"]
-    ))
 
-    doc.build(story)
+# CLIENTS
+@app.route("/clients/<int:id>")
+@login_required
+@replica_reads
+def client_timeline(id):
+    client = Client.query.get_or_404(id)
+    # only show the kinds of records the user's role can open elsewhere
+    kinds = {"quotation"}
+    if current_user.role in ("Admin", "Sales", "Manager"):
+        kinds.add("followup")
+    if current_user.role in ("Admin", "Accountant", "Manager"):
+        kinds.add("invoice")
+    page = clients.timeline(client.id, kinds, cursor=request.args.get("cursor"))
+    counts, invoiced = clients.summary(client.id, kinds)
+    return render_template("client_timeline.html", client=client, events=page.items, page=page,
+                           counts=counts, invoiced=invoiced)
+
+
+# SEARCH
+@app.route("/search")
+@login_required
+@replica_reads
+def search_api():
+    entities = set(search.SOURCES)
+    if current_user.role not in ("Admin", "Sales", "Manager"):
+        entities.discard("followups")
+    requested = request.args.get("type")
+    if requested:
+        entities &= set(requested.split(","))
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    results, took_ms = search.search(request.args.get("q", ""), entities, limit)
+    return jsonify(results=results, took_ms=took_ms)
+
+
+# CSV / JSON EXPORTS
+def _export_response(entity, query, fmt, archived=False):
+    if fmt not in ("csv", "json"):
+        abort(404)
+    mimetype = "text/csv" if fmt == "csv" else "application/json"
+    chunks = export.stream(entity, query, fmt, archived)
+    response = current_app.response_class(stream_with_context(chunks), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={entity}_{datetime.now():%Y%m%d}.{fmt}"
+    return response
+
+
+@app.route("/followups/export.<fmt>")
+@login_required
+@role_required("Sales", "Manager")
+@replica_reads
+def export_followups(fmt):
+    # ?archived=1 exports the archived follow-ups instead, as on the list page
+    archived = bool(request.args.get("archived"))
+    model = FollowUpArchive if archived else FollowUp
+    return _export_response("followups", filters.followups(request.args, model), fmt, archived)
+
 
-    return send_file(pdf_path, as_attachment=True)
+@app.route("/quotations/export.<fmt>")
+@login_required
+@replica_reads
+def export_quotations(fmt):
+    return _export_response("quotations", filters.quotations(request.args), fmt)
 
 
+@app.route("/invoices/export.<fmt>")
+@login_required
+@role_required("Accountant", "Manager")
+@replica_reads
+def export_invoices(fmt):
+    archived = bool(request.args.get("archived"))
+    model = InvoiceArchive if archived else Invoice
+    return _export_response("invoices", filters.invoices(request.args, model), fmt, archived)
 
 
+@app.route("/products/export.<fmt>")
+@login_required
+@replica_reads
+def export_products(fmt):
+    return _export_response("products", filters.products(request.args), fmt)
 
 
 # REPORTS with chart data
+def _report_summary(year, start, end):
+    return summary_cache.get_or_compute("reports", (year, start, end), lambda: {
+        "status_counts": reporting.followup_status_counts(year, start, end),
+        "total_sales": reporting.total_sales(year, start, end),
+        "sales_values": reporting.monthly_sales(year, start, end),
+        "years": reporting.available_years(),
+    })
+
+
+@app.route("/reports/export.<fmt>")
+@login_required
+@role_required("Admin", "Manager")
+@replica_reads
+def export_report(fmt):
+    year = reporting.parse_year(request.args.get("year"))
+    start = reporting.parse_date(request.args.get("start"))
+    end = reporting.parse_date(request.args.get("end"))
+    summary = _report_summary(year, start, end)
+    monthly = [{"month": name, "sales": value}
+               for name, value in zip(reporting.MONTH_NAMES, summary["sales_values"])]
+    if fmt == "json":
+        return jsonify(year=year, start=start and str(start), end=end and str(end),
+                       total_sales=summary["total_sales"],
+                       followup_status=summary["status_counts"], monthly_sales=monthly)
+    if fmt != "csv":
+        abort(404)
+    response = current_app.response_class(export.stream_csv(["month", "sales"], monthly), mimetype="text/csv")
+    response.headers["Content-Disposition"] = f"attachment; filename=report_{year}.csv"
+    return response
+
 @app.route("/reports")
 @login_required
 @role_required("Admin", "Manager")
+@replica_reads
 def reports():
+    year = reporting.parse_year(request.args.get("year"))
+    start = reporting.parse_date(request.args.get("start"))
+    end = reporting.parse_date(request.args.get("end"))
+    summary = _report_summary(year, start, end)
+
     # --- Follow-up stats ---
-    total_followups = FollowUp.query.count()
-    pending = FollowUp.query.filter_by(status="pending").count()
-    completed = FollowUp.query.filter_by(status="completed").count()
-
-    # --- Compute total sales dynamically from invoice.items ---
-    invoices = Invoice.query.all()
-    total_sales = 0
-    monthly_sales = {}
-
-    for inv in invoices:
-        try:
-            items = json.loads(inv.items or "[]")
-        except Exception:
-            items = []
-        subtotal = sum(i.get("qty", 0) * i.get("price", 0) for i in items)
-        total = subtotal + subtotal * (inv.tax_percent / 100.0)
-        total_sales += total
-
-        # Aggregate monthly totals using created_at
-        if inv.created_at:
-            month = inv.created_at.month
-            monthly_sales[month] = monthly_sales.get(month, 0) + total
-
-    # --- Prepare data for charts ---
-    month_names = [
-        "Jan", "Feb", "Mar", "Apr", "May", "Jun",
-        "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"
-    ]
-    months = []
-    sales_values = []
+    status_counts = summary["status_counts"]
+    total_followups = sum(status_counts.values())
+    pending = status_counts.get("pending", 0)
+    completed = status_counts.get("completed", 0)
 
-    for m in range(1, 13):
-        months.append(month_names[m - 1])
-        sales_values.append(monthly_sales.get(m, 0))
+    # --- Sales, summed and bucketed by month in SQL ---
+    total_sales = summary["total_sales"]
+    sales_values = summary["sales_values"]
 
     # --- Prepare follow-up status chart data ---
     followup_status_labels = ["Pending", "Completed"]
@@ -427,11 +564,15 @@ def reports():
     # --- Render template ---
     return render_template(
         "reports.html",
+        year=year,
+        years=summary["years"],
+        start=start,
+        end=end,
         total_followups=total_followups,
         pending=pending,
         completed=completed,
         total_sales=total_sales,
-        months=months,
+        months=reporting.MONTH_NAMES,
         sales_values=sales_values,
         followup_labels=followup_status_labels,
         followup_data=followup_status_data
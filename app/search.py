@@ -0,0 +1,260 @@
+"""Full-text and prefix search over clients, follow-ups, quotations and products.
+
+Searchable text is copied into search_document (one row per source row) by a
+flush hook, so the source tables need no search-specific columns. The text is
+indexed with SQLite FTS5 or, on Postgres, a generated tsvector column with a
+GIN index plus a trigram index for substring matches; other databases fall
+back to prefix LIKE on the title. Phone numbers are stored normalized, so a
+phone query is a btree range scan on search_document.phone.
+
+Text queries treat only the last word as a prefix, ignore one-letter words
+and rank at most CANDIDATES matches, so their cost does not grow with the
+number of hits.
+"""
+import re
+import time
+
+from sqlalchemy import column, delete, event, func, insert, literal_column, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Client, FollowUp, Quotation, Product, SearchDocument
+from .utils import normalize_phone, DEFAULT_COUNTRY_CODE
+
+
+def _join(*parts):
+    return " ".join(p for p in parts if p) or None
+
+
+# entity -> (model, obj -> (title, body, raw phone))
+SOURCES = {
+    "clients": (Client, lambda o: (o.name, None, o.phone)),
+    "followups": (FollowUp, lambda o: (o.client_name, o.note, o.client_phone)),
+    "quotations": (Quotation, lambda o: (o.client_name, _join(o.product_name, o.product_details), o.client_phone)),
+    "products": (Product, lambda o: (o.name, o.details, None)),
+}
+ENTITY_BY_MODEL = {model: entity for entity, (model, _) in SOURCES.items()}
+# the columns SOURCES reads: reindex() selects just these, so it also runs on
+# older schemas during migrations
+COLUMNS = {
+    "clients": ("name", "phone"),
+    "followups": ("client_name", "note", "client_phone"),
+    "quotations": ("client_name", "product_name", "product_details", "client_phone"),
+    "products": ("name", "details"),
+}
+
+_table = SearchDocument.__table__
+
+
+def _document(entity, obj):
+    title, body, phone = SOURCES[entity][1](obj)
+    return {"entity": entity, "ref_id": obj.id, "title": title, "body": body,
+            "phone": normalize_phone(phone) or None}
+
+
+def _replace(conn, entity, objs):
+    ids = [o.id for o in objs]
+    conn.execute(delete(_table).where(_table.c.entity == entity, _table.c.ref_id.in_(ids)))
+    conn.execute(insert(_table), [_document(entity, o) for o in objs])
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_documents(session, flush_context):
+    changed, removed = {}, {}
+    for obj in list(session.new) + list(session.dirty):
+        entity = ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            changed.setdefault(entity, []).append(obj)
+    for obj in session.deleted:
+        entity = ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            removed.setdefault(entity, []).append(obj.id)
+    if not changed and not removed:
+        return
+    conn = session.connection()
+    for entity, objs in changed.items():
+        _replace(conn, entity, objs)
+    for entity, ids in removed.items():
+        conn.execute(delete(_table).where(_table.c.entity == entity, _table.c.ref_id.in_(ids)))
+
+
+def reindex(entity, after_id=None, batch_size=1000):
+    """(Re)build documents for one entity, optionally only rows with id > after_id.
+
+    Used after bulk inserts, which bypass the flush hook. The caller commits.
+    """
+    model = SOURCES[entity][0]
+    last_id = after_id or 0
+    if after_id is None:
+        db.session.execute(delete(_table).where(_table.c.entity == entity))
+    count = 0
+    while True:
+        columns = [getattr(model, name) for name in ("id",) + COLUMNS[entity]]
+        batch = (db.session.query(*columns).filter(model.id > last_id).order_by(model.id)
+                 .limit(batch_size).all())
+        if not batch:
+            break
+        _replace(db.session.connection(), entity, batch)
+        last_id = batch[-1].id
+        count += len(batch)
+    return count
+
+
+# ---------------- Dialect-specific indexes ----------------
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title, body, content='search_document', content_rowid='id',
+        prefix='2 3 4', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS search_document_ai AFTER INSERT ON search_document BEGIN
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_document_ad AFTER DELETE ON search_document BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_document_au AFTER UPDATE ON search_document BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """ALTER TABLE search_document ADD COLUMN IF NOT EXISTS tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(body, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_search_document_tsv ON search_document USING gin (tsv)",
+    "CREATE INDEX IF NOT EXISTS ix_search_document_title_trgm ON search_document USING gin (title gin_trgm_ops)",
+]
+
+
+def create_indexes():
+    """Create the full-text structures for the current database, if supported."""
+    dialect = db.engine.dialect.name
+    statements = SQLITE_DDL if dialect == "sqlite" else POSTGRES_DDL if dialect == "postgresql" else []
+    try:
+        for statement in statements:
+            db.session.execute(text(statement))
+        db.session.commit()
+    except OperationalError:
+        # e.g. SQLite built without FTS5: searches fall back to LIKE
+        db.session.rollback()
+
+
+def rebuild():
+    """Reindex every entity and resynchronise the full-text index."""
+    counts = {entity: reindex(entity) for entity in SOURCES}
+    db.session.commit()
+    if _backend() == "fts5":
+        db.session.execute(text("INSERT INTO search_fts(search_fts) VALUES ('rebuild')"))
+        db.session.commit()
+    return counts
+
+
+_backends = {}
+
+
+def _backend():
+    url = str(db.engine.url)
+    if url not in _backends:
+        dialect = db.engine.dialect.name
+        backend = "like"
+        if dialect == "sqlite":
+            found = db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_fts'")).first()
+            backend = "fts5" if found else "like"
+        elif dialect == "postgresql":
+            backend = "tsvector"
+        _backends[url] = backend
+    return _backends[url]
+
+
+# ---------------- Querying ----------------
+
+# full-text matches are ranked among at most this many of the newest
+# documents, so a common word costs the same as a rare one
+CANDIDATES = 1000
+
+def is_phone_query(q):
+    digits = sum(ch.isdigit() for ch in q)
+    return digits >= 3 and digits >= 0.6 * len(q.replace(" ", ""))
+
+
+def phone_prefix(q):
+    """Normalized prefix for a (possibly partial) phone number."""
+    digits = "".join(ch for ch in q if ch.isdigit())
+    if q.strip().startswith("+") or len(digits) > 10:
+        return digits
+    # a partial number may already carry the country code (a full 10-digit one is local)
+    if len(digits) < 10 and digits.startswith(DEFAULT_COUNTRY_CODE):
+        return digits
+    return DEFAULT_COUNTRY_CODE + digits
+
+
+def _terms(q):
+    # one-letter prefixes match nearly every document
+    return [t for t in re.findall(r"\w+", q.lower()) if len(t) >= 2][:8]
+
+
+def _text_query(q, entities, limit):
+    doc = _table
+    terms = _terms(q)
+    if not terms:
+        return None
+    backend = _backend()
+    if backend == "fts5":
+        # only the last word may still be being typed
+        match = " ".join(['"%s"' % t for t in terms[:-1]] + ['"%s"*' % terms[-1]])
+        fts = table("search_fts", column("rowid"), column("rank"))
+        # walk the matches newest first and stop after CANDIDATES; only those get ranked
+        candidates = (select(doc.c.id, fts.c.rank).join_from(fts, doc, doc.c.id == fts.c.rowid)
+                      .where(literal_column("search_fts").op("MATCH")(match),
+                             doc.c.entity.concat("").in_(entities))
+                      .order_by(fts.c.rowid.desc()).limit(CANDIDATES).subquery())
+        return (select(doc).join(candidates, candidates.c.id == doc.c.id)
+                .order_by(candidates.c.rank).limit(limit))
+    if backend == "tsvector":
+        tsquery = func.to_tsquery("simple", " & ".join(terms[:-1] + [terms[-1] + ":*"]))
+        tsv = literal_column("search_document.tsv")
+        condition = tsv.op("@@")(tsquery)
+        if len(terms) == 1 and len(terms[0]) >= 3:
+            # substring matches inside names, served by the trigram index
+            condition = or_(condition, doc.c.title.ilike(f"%{terms[0]}%"))
+        candidates = (select(doc.c.id).where(condition, doc.c.entity.in_(entities))
+                      .limit(CANDIDATES).subquery())
+        return (select(doc).where(doc.c.id.in_(select(candidates.c.id)))
+                .order_by(func.ts_rank(tsv, tsquery).desc()).limit(limit))
+    return (select(doc).where(doc.c.title.startswith(q.strip(), autoescape=True),
+                              doc.c.entity.in_(entities))
+            .limit(limit))
+
+
+def search(q, entities=None, limit=20):
+    """Return (results, elapsed_ms) for q across the given entity types."""
+    started = time.perf_counter()
+    entities = [e for e in (entities or SOURCES) if e in SOURCES]
+    q = (q or "").strip()
+    results = []
+    if q and entities:
+        doc = _table
+        if is_phone_query(q):
+            prefix = phone_prefix(q)
+            # btree range scan: every phone starting with prefix. The entity
+            # test is wrapped in an expression so SQLite cannot pick the
+            # (entity, ref_id) index instead and sort every matching row.
+            stmt = (select(doc).where(doc.c.phone >= prefix, doc.c.phone < prefix + ":",
+                                      doc.c.entity.concat("").in_(entities))
+                    .order_by(doc.c.phone).limit(limit))
+        else:
+            stmt = _text_query(q, entities, limit)
+        if stmt is not None:
+            for row in db.session.execute(stmt).mappings():
+                body = row["body"] or ""
+                results.append({
+                    "type": row["entity"],
+                    "id": row["ref_id"],
+                    "title": row["title"],
+                    "snippet": body[:120] + ("…" if len(body) > 120 else ""),
+                    "phone": row["phone"],
+                })
+    return results, round((time.perf_counter() - started) * 1000, 2)
@@ -2,6 +2,10 @@ from functools import wraps
 from flask import abort
 from flask_login import current_user
 
+def has_role(*roles):
+    """True if the current user has one of the roles (Admin has them all)."""
+    return current_user.role in roles or current_user.role == "Admin"
+
 def role_required(*roles):
     """Allow access only to users with given roles."""
     def wrapper(fn):
@@ -10,9 +14,22 @@ def role_required(*roles):
             if not current_user.is_authenticated:
                 abort(401)
 
-            if current_user.role not in roles and current_user.role != "Admin":
+            if not has_role(*roles):
                 abort(403)
 
             return fn(*args, **kwargs)
         return decorated_view
     return wrapper
+
+
+# default country code for 10-digit local numbers, adjust if needed
+DEFAULT_COUNTRY_CODE = "91"
+
+def normalize_phone(phone):
+    """Digits-only international form: +country numbers kept, 10-digit local numbers get the default code."""
+    phone = (phone or "").strip()
+    digits = "".join(ch for ch in phone if ch.isdigit())
+    # Accept +91, +country or 10-digit local numbers
+    if not phone.startswith("+") and len(digits) == 10:
+        return DEFAULT_COUNTRY_CODE + digits
+    return digits
@@ -1,6 +1,122 @@
 import os
 
+
+def _flag(name, default=""):
+    return os.environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+def _database_url(url):
+    # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+    if url and url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def _engine_options(url):
+    """Pool and timeout settings for server databases; SQLite keeps SQLAlchemy's defaults."""
+    if url.startswith("sqlite"):
+        return {}
+    options = {
+        # per process: gunicorn workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) must fit max_connections
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        # recycle before server/proxy idle timeouts, and test connections on checkout
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": _flag("DB_POOL_PRE_PING", "1"),
+    }
+    timeout = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000))
+    if timeout and url.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev_key")
-    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///crm.db")
+    SQLALCHEMY_DATABASE_URI = _database_url(os.environ.get("DATABASE_URL", "sqlite:///crm.db"))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # optional read replica for @replica_reads views (reports, lists, exports, API reads)
+    DATABASE_REPLICA_URL = _database_url(os.environ.get("DATABASE_REPLICA_URL"))
+    SQLALCHEMY_BINDS = {"replica": DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+    # seconds a browser keeps reading from the primary after it wrote something
+    REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+
+    # run pending migrations inside create_app(); off by default, use `flask db-upgrade` per deploy
+    AUTO_MIGRATE = _flag("AUTO_MIGRATE")
+    # set up ReportLab when the app is created rather than on the first PDF (pair with gunicorn --preload)
+    PDF_WARM_UP = _flag("PDF_WARM_UP")
+
+    # single-node SQLite: WAL journal so readers don't wait for writers
+    SQLITE_WAL = _flag("SQLITE_WAL", "1")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_KB = int(os.environ.get("SQLITE_CACHE_KB", 20000))
+
+    # HTTP compression of HTML/JSON/CSS/CSV responses and static files (gzip; brotli
+    # too when the brotli package is installed), and fingerprinted static URLs
+    COMPRESS_RESPONSES = _flag("COMPRESS_RESPONSES", "1")
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 500))  # bytes; smaller bodies are sent as-is
+    STATIC_CACHE_DIR = os.environ.get("STATIC_CACHE_DIR")  # precompressed assets, default instance/static-cache
+    STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", 31536000))  # seconds, for fingerprinted URLs
+
+    # dashboard/report summary cache (seconds; 0 disables)
+    SUMMARY_CACHE_TTL = int(os.environ.get("SUMMARY_CACHE_TTL", 60))
+    SUMMARY_CACHE_SIZE = int(os.environ.get("SUMMARY_CACHE_SIZE", 256))
+
+    # seconds other processes may serve a stale product catalog (quotation typeahead; 0 = until a local write)
+    CATALOG_CACHE_TTL = int(os.environ.get("CATALOG_CACHE_TTL", 300))
+
+    # seconds a logged-in user's identity/role is cached per process (0 disables)
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 30))
+
+    # list pages (followups, invoices, quotations, products)
+    LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", 25))
+    LIST_MAX_PAGE_SIZE = int(os.environ.get("LIST_MAX_PAGE_SIZE", 100))
+
+    # rendered invoice PDFs: "memory" keeps the last INVOICE_PDF_CACHE_SIZE in each process,
+    # "file" also writes them to INVOICE_PDF_DIR (default app/static/invoices)
+    INVOICE_PDF_STORAGE = os.environ.get("INVOICE_PDF_STORAGE", "memory")
+    INVOICE_PDF_CACHE_SIZE = int(os.environ.get("INVOICE_PDF_CACHE_SIZE", 64))
+    INVOICE_PDF_DIR = os.environ.get("INVOICE_PDF_DIR")
+    # processes used for batch PDF export (unset = one per CPU, 0 = render in-process)
+    INVOICE_EXPORT_WORKERS = int(os.environ["INVOICE_EXPORT_WORKERS"]) if os.environ.get("INVOICE_EXPORT_WORKERS") else None
+
+    # background jobs (flask jobs-worker)
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+    JOB_LOCK_TIMEOUT = int(os.environ.get("JOB_LOCK_TIMEOUT", 600))  # seconds before a running job is requeued
+    # files the worker produces for download (default instance/job_results); when
+    # web and worker run on different machines or dynos this must be shared storage
+    JOB_RESULTS_DIR = os.environ.get("JOB_RESULTS_DIR")
+
+    # bulk CSV/Excel imports (uploads and error reports, default instance/imports); when
+    # web and worker run on different machines or dynos this must be shared storage
+    IMPORT_DIR = os.environ.get("IMPORT_DIR")
+    IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 1000))
+
+    # JSON API (/api/v1): most objects accepted by one batch create/update
+    API_MAX_BATCH = int(os.environ.get("API_MAX_BATCH", 500))
+
+    # request instrumentation: Server-Timing headers, /metrics and the slow-query log (off by default)
+    INSTRUMENTATION = _flag("INSTRUMENTATION")
+    SLOW_QUERY_MS = int(os.environ.get("SLOW_QUERY_MS", 200))
+    QUERY_COUNT_WARN = int(os.environ.get("QUERY_COUNT_WARN", 50))  # SQL statements per request (0 disables)
+    # /metrics needs "Authorization: Bearer <token>"; without a token it is not served
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+    # follow-up reminders (flask reminders): "log", "file" (JSON lines, default
+    # instance/reminders.jsonl) or "webhook" (POSTed to REMINDER_WEBHOOK_URL)
+    REMINDER_NOTIFIER = os.environ.get("REMINDER_NOTIFIER", "log")
+    REMINDER_FILE = os.environ.get("REMINDER_FILE")
+    REMINDER_WEBHOOK_URL = os.environ.get("REMINDER_WEBHOOK_URL")
+    REMINDER_LEAD_MINUTES = int(os.environ.get("REMINDER_LEAD_MINUTES", 15))  # remind this long before
+    REMINDER_INTERVAL = int(os.environ.get("REMINDER_INTERVAL", 30))  # seconds between checks
+    REMINDER_LOOKAHEAD = int(os.environ.get("REMINDER_LOOKAHEAD", 3600))  # seconds queued ahead in memory
+    REMINDER_RESYNC = int(os.environ.get("REMINDER_RESYNC", 600))  # seconds between full reloads
+    REMINDER_BATCH_SIZE = int(os.environ.get("REMINDER_BATCH_SIZE", 500))
+
+    # archival (flask archive, or the "archive" job): completed follow-ups and
+    # invoices older than this many days move to the *_archive tables
+    ARCHIVE_FOLLOWUPS_AFTER_DAYS = int(os.environ.get("ARCHIVE_FOLLOWUPS_AFTER_DAYS", 365))
+    ARCHIVE_INVOICES_AFTER_DAYS = int(os.environ.get("ARCHIVE_INVOICES_AFTER_DAYS", 730))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", 1000))  # rows per transaction
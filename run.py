@@ -3,4 +3,8 @@ from app import create_app
 app = create_app()
 
 if __name__ == "__main__":
+    # the development server brings the schema up to date itself
+    from app import migrations
+    with app.app_context():
+        migrations.upgrade()
     app.run(debug=True)
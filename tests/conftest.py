@@ -0,0 +1,57 @@
+"""Shared fixtures: one app, pointed at a throwaway SQLite database."""
+import os
+import tempfile
+
+import pytest
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(WORK_DIR, "crm.db")
+os.environ["STATIC_CACHE_DIR"] = os.path.join(WORK_DIR, "static-cache")
+os.environ.pop("AUTO_MIGRATE", None)
+
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from app import create_app, db, migrations  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+
+@pytest.fixture
+def db_path(app):
+    """Path of the test database, deleted so the test starts from nothing."""
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    path = make_url(app.config["SQLALCHEMY_DATABASE_URI"]).database
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return path
+
+
+@pytest.fixture
+def database(app, db_path):
+    """A freshly migrated, empty database."""
+    with app.app_context():
+        migrations.upgrade()
+
+
+@pytest.fixture
+def login(app, database):
+    """login(role) -> a test client signed in as a new user with that role."""
+    def login(role):
+        with app.app_context():
+            user = User(username=role.lower(), role=role)
+            user.set_password("secret")
+            db.session.add(user)
+            db.session.commit()
+        client = app.test_client()
+        assert client.post("/login", data={"username": role.lower(), "password": "secret"}).status_code == 302
+        return client
+    return login
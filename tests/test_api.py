@@ -0,0 +1,25 @@
+"""The JSON API's validation."""
+
+
+def test_followup_datetime_with_offset_rejected(app, login):
+    client = login("Sales")
+    body = {"client_name": "Ravi", "client_phone": "9876543210"}
+
+    response = client.post("/api/v1/followups", json=dict(body, followup_datetime="2025-01-02T10:30:00+05:30"))
+    assert response.status_code == 422
+    assert response.json["errors"] == [{"index": 0, "errors": {"followup_datetime": "must not include a UTC offset"}}]
+
+    response = client.post("/api/v1/followups", json=dict(body, followup_datetime="2025-01-02T10:30:00"))
+    assert response.status_code == 201
+    assert response.json["followup_datetime"] == "2025-01-02T10:30:00"
+
+    response = client.patch("/api/v1/followups/1", json={"followup_datetime": "2025-01-02T10:30:00Z"})
+    assert response.status_code == 422
+
+
+def test_update_with_non_integer_id(app, login):
+    client = login("Sales")
+
+    response = client.patch("/api/v1/followups", json=[{"id": "1", "note": "x"}, {"id": True, "note": "y"}])
+    assert response.status_code == 422
+    assert [e["errors"]["id"] for e in response.json["errors"]] == ["must be an integer"] * 2
@@ -0,0 +1,50 @@
+"""Reading follow-ups and invoices after they are archived."""
+import csv
+import io
+from datetime import datetime, timedelta
+
+from app import archive, db
+from app.models import FollowUp, FollowUpArchive, Invoice, InvoiceArchive, InvoiceItem
+
+
+def _archive_old_rows(app):
+    old, recent = datetime.now() - timedelta(days=1000), datetime.now()
+    with app.app_context():
+        for when in (old, recent):
+            db.session.add(FollowUp(client_name="Ravi", client_phone="9876543210", followup_datetime=when,
+                                    status="completed"))
+            invoice = Invoice(client_name="Ravi", created_at=when, tax_percent=0,
+                              items=[InvoiceItem(name="Widget", qty=2, price=5)])
+            invoice.recalculate()
+            db.session.add(invoice)
+        db.session.commit()
+        assert archive.archive("followups", 365) == 1
+        assert archive.archive("invoices", 730) == 1
+        assert db.session.get(FollowUpArchive, 1) and db.session.get(InvoiceArchive, 1)
+
+
+def test_api_reads_archived_records(app, login):
+    client = login("Manager")
+    _archive_old_rows(app)
+
+    followup = client.get("/api/v1/followups/1")
+    assert followup.status_code == 200
+    assert followup.json["status"] == "completed"
+    invoice = client.get("/api/v1/invoices/1")
+    assert invoice.status_code == 200
+    assert invoice.json["total"] == 10
+    assert invoice.json["items"] == [{"name": "Widget", "qty": 2, "price": 5, "line_total": 10}]
+    assert client.patch("/api/v1/invoices/1", json={"client_name": "Bob"}).status_code == 404
+
+
+def test_export_archived(app, login):
+    client = login("Manager")
+    _archive_old_rows(app)
+
+    hot = list(csv.DictReader(io.StringIO(client.get("/invoices/export.csv").get_data(as_text=True))))
+    archived = list(csv.DictReader(io.StringIO(client.get("/invoices/export.csv?archived=1").get_data(as_text=True))))
+    assert [row["id"] for row in hot] == ["2"]
+    assert [(row["id"], row["item_name"]) for row in archived] == [("1", "Widget")]
+
+    followups = client.get("/followups/export.json?archived=1").json
+    assert [row["id"] for row in followups] == [1]
@@ -0,0 +1,57 @@
+"""Bulk actions on the follow-up list."""
+from datetime import datetime
+
+from app import db
+from app.models import FollowUp, User
+
+
+def _followups(app, count):
+    with app.app_context():
+        owner = User.query.first()
+        rows = [FollowUp(client_name=f"Client {n}", client_phone="9876543210",
+                         followup_datetime=datetime(2025, 1, n + 1, 10), status="pending", user_id=owner.id)
+                for n in range(count)]
+        db.session.add_all(rows)
+        db.session.commit()
+        return [row.id for row in rows]
+
+
+def _statuses(app):
+    with app.app_context():
+        return [status for status, in db.session.query(FollowUp.status).order_by(FollowUp.id)]
+
+
+def test_sales_bulk_complete(app, login):
+    client = login("Sales")
+    ids = _followups(app, 3)
+
+    # the page renders no user_id select for Sales, so none is posted
+    response = client.post("/followups/bulk", data={"action": "complete", "scope": "selected", "ids": ids[:2]},
+                           follow_redirects=True)
+
+    assert response.status_code == 200
+    assert b"2 follow-ups marked completed" in response.data
+    assert _statuses(app) == ["completed", "completed", "pending"]
+
+
+def test_sales_bulk_reschedule(app, login):
+    client = login("Sales")
+    ids = _followups(app, 2)
+
+    client.post("/followups/bulk", data={"action": "reschedule", "scope": "selected", "ids": ids[1],
+                                         "followup_date": "2025-03-01", "followup_time": "09:30"})
+
+    with app.app_context():
+        assert db.session.get(FollowUp, ids[1]).followup_datetime == datetime(2025, 3, 1, 9, 30)
+
+
+def test_reassign_rejects_unknown_user(app, login):
+    client = login("Manager")
+    ids = _followups(app, 1)
+
+    response = client.post("/followups/bulk", data={"action": "reassign", "scope": "selected", "ids": ids,
+                                                    "user_id": 999}, follow_redirects=True)
+
+    assert b"Not a valid choice." in response.data
+    with app.app_context():
+        assert db.session.get(FollowUp, ids[0]).user_id != 999
@@ -0,0 +1,19 @@
+"""Invoice PDF downloads."""
+from werkzeug.http import http_date
+
+
+def test_pdf_conditional_requests(app, login):
+    assert app.config["INVOICE_PDF_STORAGE"] == "memory"
+    client = login("Accountant")
+    client.post("/invoices", data={"client_name": "Ravi", "item_name": "Widget", "item_qty": 3,
+                                   "item_price": 10, "tax_percent": 18})
+
+    first = client.get("/invoices/pdf/1")
+    assert first.status_code == 200
+    assert first.mimetype == "application/pdf"
+    assert first.last_modified is not None
+
+    by_date = client.get("/invoices/pdf/1", headers={"If-Modified-Since": http_date(first.last_modified)})
+    assert by_date.status_code == 304
+    by_etag = client.get("/invoices/pdf/1", headers={"If-None-Match": first.headers["ETag"]})
+    assert by_etag.status_code == 304
@@ -0,0 +1,88 @@
+"""Upgrading databases left at each older schema version to the current one.
+
+A database at version N is built the way an older release left it: the
+pre-migration (baseline) tables with some rows, upgraded only as far as N.
+Upgrading it to head must succeed and keep the data.
+"""
+import json
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+
+from app import db, migrations
+
+HEAD = migrations.MIGRATIONS[-1][0]
+
+# the tables as created before versioned migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL, username VARCHAR(80) NOT NULL, password_hash VARCHAR(128) NOT NULL,
+    role VARCHAR(30), PRIMARY KEY (id), UNIQUE (username));
+CREATE TABLE client (id INTEGER NOT NULL, name VARCHAR(150) NOT NULL, phone VARCHAR(20), PRIMARY KEY (id));
+CREATE TABLE product (
+    id INTEGER NOT NULL, name VARCHAR(150) NOT NULL, details TEXT, website_price FLOAT, PRIMARY KEY (id));
+CREATE TABLE quotation (
+    id INTEGER NOT NULL, client_name VARCHAR(150) NOT NULL, client_phone VARCHAR(20) NOT NULL,
+    product_name VARCHAR(150) NOT NULL, product_details TEXT, website_price FLOAT, created_at DATETIME,
+    PRIMARY KEY (id));
+CREATE TABLE invoice (
+    id INTEGER NOT NULL, client_name VARCHAR(150) NOT NULL, created_at DATETIME, items TEXT,
+    tax_percent FLOAT, PRIMARY KEY (id));
+CREATE TABLE follow_up (
+    id INTEGER NOT NULL, client_name VARCHAR(100) NOT NULL, client_phone VARCHAR(15) NOT NULL,
+    followup_datetime DATETIME NOT NULL, note TEXT, status VARCHAR(20), user_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id));
+"""
+
+
+def _baseline_rows(conn):
+    conn.execute("INSERT INTO user VALUES (1, 'admin', 'x', 'Admin')")
+    conn.execute("INSERT INTO client VALUES (1, 'Acme', '98765 43210'), (2, 'Acme Ltd', '+91 9876543210')")
+    conn.execute("INSERT INTO product VALUES (1, 'Widget', 'Blue', 10)")
+    conn.execute("INSERT INTO quotation VALUES (1, 'Acme', '9876543210', 'Widget', 'Blue', 10, '2024-01-02 10:00:00'),"
+                 " (2, 'Bob', '9876500000', 'Widget', NULL, 10, NULL)")
+    conn.execute("INSERT INTO invoice VALUES (1, 'Acme', '2024-01-03 10:00:00', ?, 18), (2, 'Bob', NULL, ?, 0)",
+                 (json.dumps([{"name": "Widget", "qty": 2, "price": 5}]),
+                  json.dumps([{"name": "Setup", "qty": 1, "price": 3}])))
+    conn.execute("INSERT INTO follow_up VALUES (1, 'Acme', '9876543210', '2024-01-04 10:00:00', 'Call', 'Completed', 1),"
+                 " (2, 'Bob', '9876500000', '2024-02-04 10:00:00', NULL, NULL, 1)")
+
+
+def _build_baseline(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    _baseline_rows(conn)
+    conn.commit()
+    conn.close()
+
+
+def _scalar(sql):
+    return db.session.execute(text(sql)).scalar()
+
+
+@pytest.mark.parametrize("version", range(HEAD))
+def test_upgrade_from_older_version(app, db_path, version):
+    _build_baseline(db_path)
+    with app.app_context():
+        migrations.upgrade(target=version)
+        assert migrations.current_version() == version
+
+        assert migrations.upgrade() == list(range(version + 1, HEAD + 1))
+        assert migrations.current_version() == HEAD
+        assert _scalar("SELECT subtotal FROM invoice WHERE id = 1") == 10
+        assert _scalar("SELECT total FROM invoice WHERE id = 1") == pytest.approx(11.8)
+        assert _scalar("SELECT count(*) FROM invoice_item WHERE invoice_id = 1") == 1
+        assert _scalar("SELECT group_concat(status) FROM (SELECT status FROM follow_up ORDER BY id)") == "completed,pending"
+        assert _scalar("SELECT count(*) FROM client") == 1  # duplicate phone dropped
+        assert _scalar("SELECT count(*) FROM quotation WHERE created_at IS NULL") == 0
+        assert _scalar("SELECT created_at FROM invoice WHERE id = 2") == "2024-01-03 10:00:00"
+        assert _scalar("SELECT sum(total) FROM sales_rollup") == pytest.approx(14.8)
+        assert _scalar("SELECT sum(count) FROM follow_up_rollup") == 2
+        assert _scalar("SELECT count(*) FROM search_document WHERE entity = 'followups'") == 2
+
+
+def test_upgrade_fresh_database(app, db_path):
+    with app.app_context():
+        assert migrations.upgrade() == list(range(1, HEAD + 1))
+        assert migrations.upgrade() == []
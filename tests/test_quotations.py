@@ -0,0 +1,35 @@
+"""Creating quotations from the product catalog."""
+from sqlalchemy import insert
+
+from app import db
+from app.catalog import product_catalog
+from app.models import Product, Quotation
+
+
+def test_quote_product_added_by_another_worker(app, login):
+    client = login("Sales")
+    with app.app_context():
+        product_catalog.snapshot()  # this worker's snapshot predates the product
+        # written the way another process would, without this process's commit hooks
+        with db.engine.begin() as conn:
+            product_id = conn.execute(insert(Product.__table__).values(
+                name="Widget", details="Blue", website_price=12.5)).inserted_primary_key[0]
+
+    response = client.post("/quotations", data={"client_name": "Ravi", "client_phone": "9876543210",
+                                                "product_id": str(product_id), "website_price": ""})
+
+    assert response.status_code == 302
+    with app.app_context():
+        quotation = Quotation.query.one()
+        assert (quotation.product_id, quotation.product_name, quotation.website_price) == (product_id, "Widget", 12.5)
+        assert product_catalog.snapshot().by_id[product_id]["name"] == "Widget"
+
+
+def test_unknown_product_rejected(app, login):
+    client = login("Sales")
+
+    response = client.post("/quotations", data={"client_name": "Ravi", "client_phone": "9876543210",
+                                                "product_id": "999"})
+
+    assert response.status_code == 200
+    assert b"Unknown product" in response.data
@@ -0,0 +1,59 @@
+"""The follow-up reminder scheduler."""
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import FollowUp
+from app.reminders import Notifier, Scheduler
+
+
+class ListNotifier(Notifier):
+    def __init__(self):
+        self.sent = []
+
+    def send(self, reminders):
+        self.sent.extend(r["id"] for r in reminders)
+
+
+def _followup(when):
+    followup = FollowUp(client_name="Ravi", client_phone="9876543210", followup_datetime=when, status="pending")
+    db.session.add(followup)
+    db.session.commit()
+    return followup.id
+
+
+def _reschedule(id, when):
+    db.session.get(FollowUp, id).followup_datetime = when
+    db.session.commit()
+
+
+def test_reschedule_into_loaded_window(app, database):
+    now = datetime.now()
+    notifier = ListNotifier()
+    scheduler = Scheduler(notifier, lead=timedelta(minutes=15), lookahead=timedelta(hours=1))
+    with app.app_context():
+        later = _followup(now + timedelta(days=7))
+        queued = _followup(now + timedelta(minutes=50))
+        assert scheduler.tick(now) == 0
+
+        # one from outside the window, one already queued for later
+        _reschedule(later, now + timedelta(minutes=5))
+        _reschedule(queued, now + timedelta(minutes=10))
+        assert scheduler.tick(now + timedelta(seconds=30)) == 2
+        assert sorted(notifier.sent) == sorted([later, queued])
+
+        # each is reminded once, not again for the heap entry it had before
+        assert scheduler.tick(now + timedelta(hours=2)) == 0
+
+
+def test_reminded_followup_rescheduled(app, database):
+    now = datetime.now()
+    notifier = ListNotifier()
+    scheduler = Scheduler(notifier)
+    with app.app_context():
+        id = _followup(now + timedelta(minutes=5))
+        assert scheduler.tick(now) == 1
+
+        _reschedule(id, now + timedelta(minutes=30))
+        assert scheduler.tick(now + timedelta(seconds=30)) == 0
+        assert scheduler.tick(now + timedelta(minutes=20)) == 1
+        assert notifier.sent == [id, id]
@@ -0,0 +1,23 @@
+"""Search query parsing and the full-text lookup."""
+from app import db, search
+from app.models import Client, Product
+
+
+def test_phone_prefix():
+    assert search.phone_prefix("98765") == "9198765"
+    assert search.phone_prefix("9170000") == "9170000"  # already has the country code
+    assert search.phone_prefix("9123456789") == "919123456789"  # a full local number
+    assert search.phone_prefix("+44 20") == "4420"
+
+
+def test_text_search(app, database):
+    with app.app_context():
+        db.session.add_all([Client(name="Rahul Sharma", phone="9876543210"),
+                            Product(name="Call tracker", details="pricing plans")])
+        db.session.commit()
+
+        assert [r["title"] for r in search.search("rahul shar")[0]] == ["Rahul Sharma"]
+        assert [r["title"] for r in search.search("call pric")[0]] == ["Call tracker"]
+        assert search.search("r")[0] == []
+        assert [r["title"] for r in search.search("917654")[0]] == []
+        assert [r["title"] for r in search.search("9198765")[0]] == ["Rahul Sharma"]